@@ -17,29 +17,59 @@ Notes:
 """
 from __future__ import annotations
 import argparse
+import mmap
+import os
 import re
 import shutil
 from pathlib import Path
 from datetime import datetime
 import sys
 
-LI_RE = re.compile(r'(<li\s+class="file"[\s\S]*?</li>)', re.I)
-DATA_PATH_RE = re.compile(r'data-path="([^"]+)"', re.I)
-DATA_PDF_RE = re.compile(r'data-pdf="([^"]*)"', re.I)
+# Byte patterns: the index is scanned straight out of an mmap, no decode/copy
+# Unrolled loop instead of lazy [\s\S]*?: linear scan, no backtracking on unclosed <li>
+LI_RE = re.compile(rb'(<li\s+class="file"[^<]*(?:<(?!/li>)[^<]*)*</li>)', re.I)
+# data-path and data-pdf pulled out in a single scan of each LI block
+DATA_ATTR_RE = re.compile(rb'data-(path|pdf)="([^"]*)"', re.I)
 
-def find_li_blocks(text: str):
-    return LI_RE.findall(text)
+def map_file(path: Path):
+    """Open path read-only and return (file, mmap). Caller closes both."""
+    f = open(path, 'rb')
+    try:
+        return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # empty file: mmap refuses zero-length maps
+        f.close()
+        raise
 
-def li_matches(li_html: str, patterns):
-    m1 = DATA_PATH_RE.search(li_html)
-    m2 = DATA_PDF_RE.search(li_html)
-    pth = m1.group(1) if m1 else ""
-    pdf = m2.group(1) if m2 else ""
+def find_li_blocks(text: bytes):
+    """Yield (li_html, start, end) for each LI block, in document order."""
+    for m in LI_RE.finditer(text):
+        yield m.group(1), m.start(1), m.end(1)
+
+def li_matches(li_html: bytes, patterns: list[re.Pattern]):
+    attrs = {}
+    for m in DATA_ATTR_RE.finditer(li_html):
+        # first occurrence of each attribute wins
+        attrs.setdefault(m.group(1).lower(), m.group(2).decode('utf-8', 'replace'))
+    pth = attrs.get(b'path', "")
+    pdf = attrs.get(b'pdf', "")
     for pat in patterns:
-        if re.search(pat, pth) or re.search(pat, pdf):
+        if pat.search(pth) or pat.search(pdf):
             return True
     return False
 
+def atomic_replace_with_backup(path: Path, data: bytes, bak: Path):
+    """
+    Write data to a temp file beside path, move the current file to bak and
+    the temp file into place. Renames are metadata-only, so the index is
+    written once (no copy2) and never left half-written.
+    """
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    shutil.copymode(path, tmp)
+    os.rename(path, bak)
+    os.replace(tmp, path)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--index', default='Doc/index.html', help='Path to index.html')
@@ -52,38 +82,52 @@ def main():
         print("Index not found:", index_path, file=sys.stderr)
         sys.exit(1)
 
-    txt = index_path.read_text(encoding='utf-8', errors='replace')
-    li_blocks = find_li_blocks(txt)
-    to_remove = []
-    for li in li_blocks:
-        if li_matches(li, args.pattern):
-            # find the exact span in the full text (first occurrence)
-            idx = txt.find(li)
-            if idx != -1:
-                to_remove.append({'html': li, 'start': idx, 'end': idx + len(li)})
-    if not to_remove:
+    # compile user patterns once instead of per LI block
+    try:
+        patterns = [re.compile(p) for p in args.pattern]
+    except re.error as e:
+        print("Invalid --pattern:", e, file=sys.stderr)
+        sys.exit(2)
+
+    try:
+        f, txt = map_file(index_path)
+    except ValueError:
         print("No matching entries found.")
         return
+    try:
+        to_remove = []
+        for li, start, end in find_li_blocks(txt):
+            if li_matches(li, patterns):
+                to_remove.append({'html': li, 'start': start, 'end': end})
+        if not to_remove:
+            print("No matching entries found.")
+            return
 
-    print("Found", len(to_remove), "matching entries to remove.")
-    for i, r in enumerate(to_remove, start=1):
-        # show a short preview
-        snippet = r['html'][:200].replace('\n', ' ')
-        print(f"{i}. {snippet}...")
+        print("Found", len(to_remove), "matching entries to remove.")
+        for i, r in enumerate(to_remove, start=1):
+            # show a short preview
+            snippet = r['html'][:200].decode('utf-8', 'replace').replace('\n', ' ')
+            print(f"{i}. {snippet}...")
 
-    if args.dry_run:
-        print("Dry-run: nothing will be written.")
-        return
+        if args.dry_run:
+            print("Dry-run: nothing will be written.")
+            return
 
-    # Remove entries from end->start to preserve indices
-    new_txt = txt
-    for r in sorted(to_remove, key=lambda x: x['start'], reverse=True):
-        new_txt = new_txt[:r['start']] + new_txt[r['end']:]
+        # Stitch the kept slices together in one pass (spans are in document order)
+        parts = []
+        cur = 0
+        for r in to_remove:
+            parts.append(txt[cur:r['start']])
+            cur = r['end']
+        parts.append(txt[cur:])
+        new_txt = b"".join(parts)
+    finally:
+        txt.close()
+        f.close()
 
     # backup and write
     bak = index_path.parent / f"{index_path.name}.bak.{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-    shutil.copy2(index_path, bak)
-    index_path.write_text(new_txt, encoding='utf-8')
+    atomic_replace_with_backup(index_path, new_txt, bak)
     print(f"Wrote cleaned index to {index_path} (backup at {bak})")
 
 if __name__ == '__main__':
@@ -26,12 +26,15 @@ Notes:
 """
 from __future__ import annotations
 import argparse
+import os
 import re
 import shutil
 from pathlib import Path
 from datetime import datetime
 import html
 import sys
+from functools import lru_cache
+from html.parser import HTMLParser
 
 LI_TEMPLATE = """
             <li class="file" data-path="{data_path}" data-pdf="{data_pdf}">
@@ -43,17 +46,110 @@ LI_TEMPLATE = """
             </li>
 """
 
+# tags repeat for every entry in a category (and desc is always empty here),
+# so those get escaped once; paths and titles are unique per entry
+_esc = lru_cache(maxsize=1024)(html.escape)
+
 # Regex helpers
 SECTION_PATTERN = re.compile(r'(<section\s+class="category"[^>]*?>\s*<h2>(?P<cat>.*?)</h2>.*?<ul\s+class="files"[^>]*?>)', re.S | re.I)
 UL_CLOSE_RE = re.compile(r'</ul\s*>', re.I)
 LI_RE = re.compile(r'(<li\s+class="file"[\s\S]*?</li>)', re.I)
 DATA_PATH_RE = re.compile(r'data-path="([^"]+)"', re.I)
 DATA_PDF_RE = re.compile(r'data-pdf="([^"]*)"', re.I)
+PDF_DATA_PDF_RE = re.compile(r'data-pdf="([^"]*\.pdf)"', re.I)
+PDF_DATA_PATH_RE = re.compile(r'data-path="([^"]*\.pdf)"', re.I)
+# any quoted md_outputs path: data-path/data-link values, hrefs ("#./md_outputs/..."), state JSON keys
+LI_REF_RE = re.compile(r'data-(?:pdf|path)="([^"]*)"')
+MD_REF_RE = re.compile(r'\./md_outputs/[^"<>]*(?=")')
+NEWLINE_RE = re.compile(r'\n')
+WS_RE = re.compile(r'\s+')
 TAGS_RE = re.compile(r'<div\s+class="tags[^>]*>(.*?)</div>', re.S | re.I)
 TITLE_RE = re.compile(r'<div\s+class="title">.*?<a[^>]*>(.*?)</a>', re.S | re.I)
 
+class _IndexParser(HTMLParser):
+    """
+    One linear tokenizer pass over index.html that records each
+    <section class="category">'s name and <ul class="files"> span, and the
+    data-pdf / data-path values of its <li class="file"> entries. Offsets
+    index into the original text; ref values are read from the raw <li>
+    HTML so they compare exactly as the regex path did.
+    """
+    def __init__(self, text: str):
+        super().__init__(convert_charrefs=False)
+        self.text = text
+        # getpos() reports (line, col); map lines back to absolute offsets
+        self.line_starts = [0] + [m.end() for m in NEWLINE_RE.finditer(text)]
+        self.categories = []
+        self.li_refs = {}
+        self.cur = None
+        self.h2_start = None
+        self.in_ul = False
+        self.li_start = None
+
+    def _offset(self) -> int:
+        line, col = self.getpos()
+        return self.line_starts[line - 1] + col
+
+    def handle_starttag(self, tag, attrs):
+        cls = dict(attrs).get('class') or ''
+        off = self._offset()
+        tag_end = off + len(self.get_starttag_text())
+        if tag == 'section' and cls == 'category' and self.cur is None:
+            self.cur = {'name': None, 'ul_open_index': None, 'ul_close_index': None,
+                        'section_start': off}
+        elif self.cur is None:
+            return
+        elif tag == 'h2' and self.cur['name'] is None and self.h2_start is None:
+            self.h2_start = tag_end
+        elif tag == 'ul' and cls == 'files' and self.cur['ul_open_index'] is None:
+            self.cur['ul_open_index'] = tag_end
+            self.in_ul = True
+        elif tag == 'li' and cls == 'file' and self.in_ul and self.li_start is None:
+            self.li_start = off
+
+    def handle_endtag(self, tag):
+        if self.cur is None:
+            return
+        off = self._offset()
+        if tag == 'h2' and self.h2_start is not None:
+            self.cur['name'] = html.unescape(self.text[self.h2_start:off].strip())
+            self.h2_start = None
+        elif tag == 'li' and self.li_start is not None:
+            li = self.text[self.li_start:self.text.index('>', off) + 1]
+            for val in LI_REF_RE.findall(li):
+                self.li_refs.setdefault(val, (li, self.cur))
+            self.li_start = None
+        elif tag == 'ul' and self.in_ul:
+            self.cur['ul_close_index'] = off
+            self.in_ul = False
+        elif tag == 'section':
+            if self.cur['ul_close_index'] is not None:
+                self.cur['name'] = self.cur['name'] or ""
+                self.categories.append(self.cur)
+            self.cur = None
+            self.h2_start = None
+            self.in_ul = False
+            self.li_start = None
+
+def parse_index(index_text: str):
+    """
+    Return (categories, li_refs) from a single HTMLParser pass; fall back to
+    the regex scan if the parser chokes on malformed markup.
+    """
+    try:
+        parser = _IndexParser(index_text)
+        parser.feed(index_text)
+        parser.close()
+        return parser.categories, parser.li_refs
+    except Exception as e:
+        print(f"Warning: HTML parse failed ({e}); falling back to regex scan.")
+    categories = find_categories(index_text)
+    return categories, index_li_refs(index_text, categories)
+
 def read_index(path: Path) -> str:
-    return path.read_text(encoding='utf-8', errors='replace')
+    # one bulk read and decode; unlike read_text there is no newline
+    # translation, so untouched parts of the file are written back byte-for-byte
+    return path.read_bytes().decode('utf-8', errors='replace')
 
 def find_categories(index_text: str):
     categories = []
@@ -62,10 +158,10 @@ def find_categories(index_text: str):
         section_start = m.start(1)
         ul_open_end = m.end(1)  # position right after the <ul ...> opening tag
         # find the ul closing tag starting from ul_open_end
-        ul_close_m = UL_CLOSE_RE.search(index_text[ul_open_end:], re.I)
+        ul_close_m = UL_CLOSE_RE.search(index_text, ul_open_end)
         if not ul_close_m:
             continue
-        ul_close_index = ul_open_end + ul_close_m.start()
+        ul_close_index = ul_close_m.start()
         categories.append({
             'name': cat,
             'ul_open_index': ul_open_end,
@@ -74,17 +170,47 @@ def find_categories(index_text: str):
         })
     return categories
 
-def find_li_blocks_between(text: str, start: int, end: int):
-    fragment = text[start:end]
-    return LI_RE.findall(fragment)
-
-def li_contains_pdf(li_html: str, pdf_rel: str) -> bool:
-    # match either data-pdf="./foo.pdf" or data-path="./foo.pdf"
-    if f'data-pdf="{pdf_rel}"' in li_html:
-        return True
-    if f'data-path="{pdf_rel}"' in li_html:
-        return True
-    return False
+def list_md_files(md_dir: Path) -> list[Path]:
+    """
+    *.md files in md_dir sorted by name, skipping dotfiles and ~$ editor temp
+    files. DirEntry caches the file type from the directory read, so this
+    costs no per-file stat() calls.
+    """
+    if not md_dir.is_dir():
+        return []
+    with os.scandir(md_dir) as it:
+        return sorted((Path(e.path) for e in it
+                       if e.name.lower().endswith('.md') and not e.name.startswith(('~$', '.'))
+                       and e.is_file()),
+                      key=lambda p: p.name)
+
+def pdf_refs_by_stem(index_text: str) -> dict:
+    """
+    Map PDF stem -> first referenced PDF value, in one pass per attribute.
+    A data-path reference wins over a data-pdf one for the same stem.
+    """
+    by_stem = {}
+    for m in PDF_DATA_PDF_RE.finditer(index_text):
+        by_stem.setdefault(Path(m.group(1)).stem, m.group(1))
+    by_path_stem = {}
+    for m in PDF_DATA_PATH_RE.finditer(index_text):
+        by_path_stem.setdefault(Path(m.group(1)).stem, m.group(1))
+    by_stem.update(by_path_stem)
+    return by_stem
+
+def index_li_refs(index_text: str, categories) -> dict:
+    """
+    One pass over every category's <ul>: map each data-pdf / data-path value
+    to the first (li_html, category) that carries it, so finding the entry
+    for a PDF is a dict lookup instead of a rescan of every category.
+    """
+    refs = {}
+    for cat in categories:
+        for m in LI_RE.finditer(index_text, cat['ul_open_index'], cat['ul_close_index']):
+            li = m.group(1)
+            for val in LI_REF_RE.findall(li):
+                refs.setdefault(val, (li, cat))
+    return refs
 
 def li_contains_data_path(li_html: str, data_path: str) -> bool:
     return f'data-path="{data_path}"' in li_html
@@ -98,7 +224,7 @@ def extract_tags(li_html: str) -> str:
 def extract_title(li_html: str, default: str) -> str:
     m = TITLE_RE.search(li_html)
     if m:
-        t = re.sub(r'\s+', ' ', m.group(1).strip())
+        t = WS_RE.sub(' ', m.group(1).strip())
         return t or default
     return default
 
@@ -108,10 +234,22 @@ def build_li(md_rel: str, pdf_rel: str, title: str, tags: str, desc: str = "") -
         data_path=html.escape(md_rel),
         data_pdf=html.escape(pdf_rel),
         title=html.escape(title),
-        desc=html.escape(desc),
-        tags=html.escape(tags or "")
+        desc=_esc(desc),
+        tags=_esc(tags or "")
     )
 
+def atomic_replace_with_backup(path: Path, data: bytes, bak: Path):
+    """
+    Write data to a temp file beside path, move the current file to bak and
+    the temp file into place. Renames are metadata-only, so the backup costs
+    no data copy and the index is never left half-written.
+    """
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    shutil.copymode(path, tmp)
+    os.rename(path, bak)
+    os.replace(tmp, path)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--doc', default='Doc', help='Doc folder')
@@ -130,85 +268,57 @@ def main():
         sys.exit(1)
 
     index_text = read_index(index_path)
-    categories = find_categories(index_text)
+    categories, li_refs = parse_index(index_text)
 
     if not categories:
         print("No categories found in index.html; aborting.", file=sys.stderr)
         sys.exit(1)
 
-    # build map: for each category record ul range
-    cat_map = categories  # list of dicts with ul_open_index and ul_close_index and name
-
     # gather md files
-    md_files = sorted([p for p in md_dir.iterdir() if p.is_file() and p.suffix.lower()=='.md']) if md_dir.exists() else []
+    md_files = list_md_files(md_dir)
     if not md_files:
         print("No md files found in", md_dir)
         return
 
+    referenced_md = set(MD_REF_RE.findall(index_text))
+    # one directory read instead of an exists() stat per md file
+    with os.scandir(doc_dir) as it:
+        pdf_names = {e.name for e in it if e.name.endswith('.pdf')}
+    pdf_ref_for_stem = None  # built on first need
+    # insert positions refer to the original index_text; every insert is
+    # spliced in by one join after the loop, so no offsets ever shift
     planned_inserts = []
-    modified_text = index_text
+    inserted_md_rels = set()
     total_added = 0
 
     for mdf in md_files:
         stem = mdf.stem
         md_rel = f'./md_outputs/{mdf.name}'
-        # skip obvious editor temp files
-        if mdf.name.startswith('~$') or mdf.name.startswith('.'):
-            continue
 
         # if md already referenced, skip
-        if md_rel in index_text:
+        if md_rel in referenced_md:
             # already referenced
             continue
 
         # find corresponding pdf in doc_dir
-        pdf_candidate = doc_dir / (stem + '.pdf')
-        if not pdf_candidate.exists():
+        pdf_name = stem + '.pdf'
+        if pdf_name not in pdf_names:
             # maybe the index references a different pdf name; try to find any pdf in index with the same stem
-            # we'll search index_text for data-pdf or data-path containing the stem + .pdf
-            pdf_match = None
-            for m in re.finditer(r'data-pdf="([^"]*\.pdf)"', index_text, re.I):
-                val = m.group(1)
-                if Path(val).stem == stem:
-                    pdf_match = val
-                    break
-            for m in re.finditer(r'data-path="([^"]*\.pdf)"', index_text, re.I):
-                val = m.group(1)
-                if Path(val).stem == stem:
-                    pdf_match = val
-                    break
+            # data-pdf / data-path values are scanned once into a stem lookup
+            if pdf_ref_for_stem is None:
+                pdf_ref_for_stem = pdf_refs_by_stem(index_text)
+            pdf_match = pdf_ref_for_stem.get(stem)
             if pdf_match is None:
                 # no pdf to attach to; skip
                 continue
             pdf_rel = pdf_match
         else:
-            pdf_rel = f'./{pdf_candidate.name}'
-
-        # check whether an entry referencing md_rel already exists (redundant check)
-        if md_rel in index_text:
-            continue
+            pdf_rel = f'./{pdf_name}'
 
-        # find the li that references this pdf (search whole index)
-        li_for_pdf = None
-        li_start_index = None
-        # iterate over categories and their li blocks to find the li and where to insert
-        found_category = None
-        found_cat_obj = None
-        for cat in cat_map:
-            lis = find_li_blocks_between(index_text, cat['ul_open_index'], cat['ul_close_index'])
-            for li in lis:
-                if li_contains_pdf(li, pdf_rel):
-                    li_for_pdf = li
-                    # compute the absolute li start index by finding first occurrence of this li inside that span
-                    span_text = index_text[cat['ul_open_index']:cat['ul_close_index']]
-                    off = span_text.find(li)
-                    if off >= 0:
-                        li_start_index = cat['ul_open_index'] + off
-                    found_category = cat['name']
-                    found_cat_obj = cat
-                    break
-            if li_for_pdf:
-                break
+        # find the li that references this pdf (first one in category order)
+        hit = li_refs.get(pdf_rel)
+        li_for_pdf, found_cat_obj = hit if hit else (None, None)
+        found_category = found_cat_obj['name'] if found_cat_obj else None
 
         if not li_for_pdf or not found_cat_obj:
             # no pdf entry found in index; skip (could add new entry but we only "connect" to existing PDF entries)
@@ -222,12 +332,10 @@ def main():
         # build new li for md
         new_li = build_li(md_rel=md_rel, pdf_rel=pdf_rel, title=existing_title, tags=tags_to_use, desc="")
 
-        # ensure we do not already have an identical data-path entry in the category
-        # check the category's span for md_rel
-        cat_span = modified_text[found_cat_obj['ul_open_index']:found_cat_obj['ul_close_index']]
-        if md_rel in cat_span:
-            # already present after earlier insertions
+        # ensure we do not plan the same data-path entry twice
+        if md_rel in inserted_md_rels:
             continue
+        inserted_md_rels.add(md_rel)
 
         # plan to insert before the category's ul close
         insert_pos = found_cat_obj['ul_close_index']
@@ -238,16 +346,6 @@ def main():
             'insert_pos': insert_pos,
             'li_html': new_li
         })
-
-        # update indices in found_cat_obj and subsequent categories to reflect planned insertion
-        # perform insertion in the working modified_text so subsequent inserts see updated positions
-        modified_text = modified_text[:insert_pos] + new_li + modified_text[insert_pos:]
-        delta = len(new_li)
-        for c in cat_map:
-            if c['ul_close_index'] >= insert_pos:
-                c['ul_close_index'] += delta
-                c['ul_open_index'] += delta
-                c['section_start'] += delta
         total_added += 1
 
     if not planned_inserts:
@@ -263,10 +361,20 @@ def main():
         print("Dry-run: no file changes written.")
         return
 
+    # build the new document in one pass; sort is stable, so entries for the
+    # same category keep their md-file order
+    parts = []
+    cursor = 0
+    for p in sorted(planned_inserts, key=lambda p: p['insert_pos']):
+        parts.append(index_text[cursor:p['insert_pos']])
+        parts.append(p['li_html'])
+        cursor = p['insert_pos']
+    parts.append(index_text[cursor:])
+    modified_text = ''.join(parts)
+
     # backup and write
     bak = index_path.parent / f"{index_path.name}.bak.{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-    shutil.copy2(index_path, bak)
-    index_path.write_text(modified_text, encoding='utf-8')
+    atomic_replace_with_backup(index_path, modified_text.encode('utf-8'), bak)
     print(f"Wrote updated index to {index_path} (backup at {bak})")
     return
 
@@ -19,20 +19,80 @@ Flags:
   --sync-script   path to the sync script (default: tools/sync_index_with_fs.py)
   --overwrite-md  pass overwrite to converter (replace existing md)
   --yes-to-all    pass --yes-to-all to the sync script when supported
+  --subprocess    run converter/sync in a separate interpreter instead of in-process
+  --jobs N        convert up to N PDFs at once, one converter process per PDF (default: 1)
 """
 from __future__ import annotations
 import argparse
+import os
+import runpy
 import shutil
 import subprocess
 import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# one env for every child interpreter (--subprocess); skip .pyc writes in children
+_ENV = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
 
-def run_converter(converter_path: str, doc_dir: str, md_dir: str, overwrite: bool):
-    from pathlib import Path
-    import subprocess
-    import sys
 
+def run_script_in_process(script_path: Path, argv: list[str]) -> int:
+    """
+    Execute the given python script in-process using runpy.run_path
+    (no interpreter startup / fork+exec). Returns exit code int.
+    """
+    if script_path.resolve() == Path(__file__).resolve():
+        print(f"Refusing to execute script in-process: it's the same as the caller ({script_path}).")
+        return 2
+
+    old_argv = sys.argv[:]
+    try:
+        sys.argv = [str(script_path)] + list(argv)
+        runpy.run_path(str(script_path), run_name="__main__")
+        return 0
+    except SystemExit as se:
+        code = se.code
+        try:
+            return int(code) if code is not None else 0
+        except Exception:
+            return 1
+    except Exception:
+        print(f"Error while running {script_path} in-process:")
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.argv = old_argv
+
+def run_script(script_path: Path, argv: list[str], in_process: bool) -> int:
+    if in_process:
+        return run_script_in_process(script_path, argv)
+    proc = subprocess.run([sys.executable, str(script_path)] + list(argv), env=_ENV, check=False)
+    return proc.returncode
+
+def pending_pdfs(doc_dir: Path, md_dir: Path, overwrite: bool = False) -> list[Path]:
+    """
+    Return PDFs directly under doc_dir with no <stem>.md in md_dir (or every
+    top-level PDF when overwrite). Mirrors the converter's own skip rule (it
+    only looks at top-level PDFs and skips existing .md unless --overwrite),
+    using one scandir per dir.
+    """
+    md_names = set()
+    if not overwrite:
+        try:
+            with os.scandir(md_dir) as it:
+                md_names = {e.name for e in it if e.is_file()}
+        except FileNotFoundError:
+            pass
+    pending = []
+    with os.scandir(doc_dir) as it:
+        for e in it:
+            if e.name.lower().endswith(".pdf") and e.is_file():
+                if Path(e.name).stem + ".md" not in md_names:
+                    pending.append(Path(e.path))
+    return sorted(pending)
+
+def resolve_converter(converter_path: str) -> Path | None:
     # expand ~ and resolve
     converter = Path(converter_path).expanduser()
     try:
@@ -43,26 +103,54 @@ def run_converter(converter_path: str, doc_dir: str, md_dir: str, overwrite: boo
 
     if not converter.exists():
         print(f"Converter not found: {converter} (expanded from '{converter_path}')")
+        return None
+    return converter
+
+def _convert_one(converter: Path, pdf: Path, md_dir: Path, overwrite: bool) -> int:
+    argv = [str(pdf), "--out-dir", str(md_dir)]
+    if overwrite:
+        argv.append("--overwrite")
+    return run_script(converter, argv, in_process=False)
+
+def run_converter_parallel(converter_path: str, pdfs: list[Path], md_dir: str, overwrite: bool, jobs: int):
+    """
+    Fan the PDFs out over `jobs` converter processes, one PDF each.
+    Always uses child interpreters: the in-process runner swaps sys.argv and
+    so cannot run several scripts at once. Threads are enough here since
+    each worker only waits on its child.
+    """
+    converter = resolve_converter(converter_path)
+    if converter is None:
+        return False
+    print(f"Running converter on {len(pdfs)} PDF(s) with {jobs} jobs:", converter)
+    with ThreadPoolExecutor(max_workers=jobs) as ex:
+        codes = list(ex.map(lambda pdf: _convert_one(converter, pdf, Path(md_dir), overwrite), pdfs))
+    failed = [pdf for pdf, rc in zip(pdfs, codes) if rc != 0]
+    for pdf in failed:
+        print("Converter failed for:", pdf)
+    return not failed
+
+def run_converter(converter_path: str, doc_dir: str, md_dir: str, overwrite: bool, in_process: bool = True):
+    converter = resolve_converter(converter_path)
+    if converter is None:
         return False
 
     # build command (adjust flags if your converter uses different names)
-    cmd = [sys.executable, str(converter), str(doc_dir), "--out-dir", str(md_dir)]
+    argv = [str(doc_dir), "--out-dir", str(md_dir)]
     if overwrite:
-        cmd.append("--overwrite")
-    print("Running converter:", " ".join(cmd))
-    proc = subprocess.run(cmd)
-    return proc.returncode == 0
+        argv.append("--overwrite")
+    print("Running converter:", converter, " ".join(argv))
+    return run_script(converter, argv, in_process) == 0
 
-def run_sync(sync_script: Path, doc_dir: Path, md_dir: Path, index_path: Path, yes_to_all: bool):
+def run_sync(sync_script: Path, doc_dir: Path, md_dir: Path, index_path: Path, yes_to_all: bool, in_process: bool = True):
     if not sync_script.exists():
         print(f"Sync script not found: {sync_script}")
         return False
-    cmd = [sys.executable, str(sync_script), "--doc", str(doc_dir), "--md", str(md_dir), "--index", str(index_path)]
+    argv = ["--doc", str(doc_dir), "--md", str(md_dir), "--index", str(index_path)]
     if yes_to_all:
-        cmd.append("--yes-to-all")
-    print("Running sync:", " ".join(cmd))
-    proc = subprocess.run(cmd)
-    return proc.returncode == 0
+        argv.append("--yes-to-all")
+    print("Running sync:", sync_script, " ".join(argv))
+    return run_script(sync_script, argv, in_process) == 0
 
 def main():
     p = argparse.ArgumentParser()
@@ -73,6 +161,8 @@ def main():
     p.add_argument("--sync-script", default="/Users/dennishmathes/Documents/MyWebsiteGIT/Scripts/tools_sync_index_with_fs.py")
     p.add_argument("--overwrite-md", action="store_true")
     p.add_argument("--yes-to-all", action="store_true")
+    p.add_argument("--subprocess", action="store_true", help="Run converter/sync via a child interpreter (old behaviour)")
+    p.add_argument("--jobs", type=int, default=1, help="Convert up to N PDFs in parallel (default: 1)")
     args = p.parse_args()
 
     doc_dir = Path(args.doc)
@@ -86,12 +176,19 @@ def main():
         sys.exit(2)
     md_dir.mkdir(parents=True, exist_ok=True)
 
-    ok = run_converter(converter, doc_dir, md_dir, overwrite=args.overwrite_md)
-    if not ok:
-        print("PDF -> MD conversion failed or converter returned non-zero. Aborting sync.")
-        sys.exit(3)
-
-    ok = run_sync(sync_script, doc_dir, md_dir, index_path, yes_to_all=args.yes_to_all)
+    pdfs = pending_pdfs(doc_dir, md_dir, overwrite=args.overwrite_md)
+    if not pdfs:
+        print("All PDFs already have Markdown in", md_dir, "- skipping converter.")
+    else:
+        if args.jobs > 1:
+            ok = run_converter_parallel(converter, pdfs, md_dir, overwrite=args.overwrite_md, jobs=args.jobs)
+        else:
+            ok = run_converter(converter, doc_dir, md_dir, overwrite=args.overwrite_md, in_process=not args.subprocess)
+        if not ok:
+            print("PDF -> MD conversion failed or converter returned non-zero. Aborting sync.")
+            sys.exit(3)
+
+    ok = run_sync(sync_script, doc_dir, md_dir, index_path, yes_to_all=args.yes_to_all, in_process=not args.subprocess)
     if not ok:
         print("Sync script returned non-zero. Check output.")
         sys.exit(4)
@@ -13,27 +13,65 @@ Subcommands:
   - list-unreferenced  List files on disk not referenced in index.html
 
 Design:
- - Prefers to run your existing per-file scripts (if found) using runpy.run_path in-process
-   to avoid macOS fork/exec Resource temporarily unavailable issues.
+ - Prefers to run your existing per-file scripts (if found) in-process, the way runpy.run_path
+   would, to avoid macOS fork/exec Resource temporarily unavailable issues. Their bytecode
+   is cached in __pycache__ like an imported module's, so reruns skip the compile.
  - Where the external script is missing, provides built-in fallback for connect, merge, list-unreferenced.
  - All write operations create a timestamped backup of Doc/index.html before writing.
 """
 from __future__ import annotations
 import argparse
+import os
 import sys
 from pathlib import Path
-import runpy
+import types
+from importlib.machinery import SourceFileLoader
+from importlib.util import cache_from_source
 import subprocess
 import shutil
 import re
 import html
+from collections import defaultdict
 from datetime import datetime
 import traceback
 
+# ---------- Patterns ----------
+# compiled once at import; the fallback implementations below only reference these
+_SECTION_PAT = re.compile(r'(<section\s+class="category"[^>]*?>\s*<h2>(?P<cat>.*?)</h2>.*?<ul\s+class="files"[^>]*?>)', re.S | re.I)
+_SECTION_BLOCK_RE = re.compile(r'(<section\s+class="category"[^>]*>.*?</section>)', re.S | re.I)
+_H2_RE = re.compile(r'<h2>(.*?)</h2>', re.S | re.I)
+_UL_RE = re.compile(r'(<ul\s+class="files"[^>]*>)(.*?)(</ul>)', re.S | re.I)
+_UL_CLOSE_RE = re.compile(r'</ul\s*>', re.I)
+_LI_RE = re.compile(r'(<li\s+class="file"[\s\S]*?</li>)', re.I)
+_TAGS_RE = re.compile(r'<div\s+class="tags[^>]*>(.*?)</div>', re.S | re.I)
+_TITLE_RE = re.compile(r'<div\s+class="title">.*?<a[^>]*>(.*?)</a>', re.S | re.I)
+_DATA_PATH_RE = re.compile(r'data-path="([^"]+)"', re.I)
+# bytes patterns for list-unreferenced, which only needs the attribute values
+_DATA_PATH_BYTES_RE = re.compile(rb'data-path="([^"]+)"', re.I)
+_DATA_PDF_BYTES_RE = re.compile(rb'data-pdf="([^"]*)"', re.I)
+# PDF references in either attribute; group 1 says which one matched
+_PDF_REF_RE = re.compile(r'data-(pdf|path)="([^"]*\.pdf)"', re.I)
+_LI_REF_RE = re.compile(r'data-(?:pdf|path)="([^"]*)"')
+# any quoted md_outputs path (data-path/data-link values, #-hrefs, state JSON keys)
+_MD_REF_RE = re.compile(r'\./md_outputs/[^"<>]*(?=")')
+_WS_RE = re.compile(r'\s+')
+
+# generated/index files in Doc/ that list-unreferenced never reports
+SKIP_NAMES = frozenset({'index.html', 'INDEX.md', '_autogen_index.md'})
+# hidden files and Office lock files, skipped in both Doc/ and md_outputs/
+SKIP_PREFIXES = ('.', '~$')
+
 # ---------- Utilities ----------
 def expand_path(p: str) -> Path:
     return Path(p).expanduser()
 
+def _stem(val: str) -> str:
+    """Path(val).stem for a '/'-separated index value, without building a Path."""
+    start = val.rfind('/') + 1
+    dot = val.rfind('.')
+    # a leading dot starts a hidden name, not a suffix (as in pathlib)
+    return val[start:dot] if dot > start else val[start:]
+
 def run_script_in_process(script_path: Path, argv: list[str]) -> int:
     script_path = script_path.resolve()
     this_path = Path(__file__).resolve()
@@ -44,9 +82,18 @@ def run_script_in_process(script_path: Path, argv: list[str]) -> int:
         print(f"Script not found: {script_path}")
         return 2
     old_argv = sys.argv[:]
+    old_main = sys.modules.get("__main__")
     try:
         sys.argv = [str(script_path)] + list(argv)
-        runpy.run_path(str(script_path), run_name="__main__")
+        # get_code reuses (or refreshes) the script's __pycache__ .pyc, where
+        # runpy.run_path recompiles the source every time
+        loader = SourceFileLoader("__main__", str(script_path))
+        code = loader.get_code("__main__")
+        module = types.ModuleType("__main__")
+        module.__dict__.update(__file__=str(script_path), __cached__=cache_from_source(str(script_path)),
+                               __loader__=loader, __package__="", __spec__=None)
+        sys.modules["__main__"] = module
+        exec(code, module.__dict__)
         return 0
     except SystemExit as se:
         code = se.code
@@ -60,33 +107,45 @@ def run_script_in_process(script_path: Path, argv: list[str]) -> int:
         return 1
     finally:
         sys.argv = old_argv
-
-def backup(path: Path) -> Path:
+        sys.modules["__main__"] = old_main
+
+def write_with_backup(path: Path, text: str) -> Path:
+    """
+    Write text to path, keeping the previous file as a timestamped .bak.
+    The new content goes to a temp file that is renamed into place after
+    the old file is renamed to the backup name, so the backup costs no data
+    copy and path is never left half-written.
+    """
     bak = path.parent / f"{path.name}.bak.{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-    shutil.copy2(path, bak)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(text, encoding='utf-8')
+    shutil.copymode(path, tmp)
+    os.rename(path, bak)
+    os.replace(tmp, path)
     return bak
 
 # ---------- Built-in fallback implementations (used if external scripts are missing) ----------
 def list_unreferenced_impl(doc_dir: Path, md_dir: Path, index_path: Path):
-    txt = index_path.read_text(encoding='utf-8', errors='replace')
-    referenced = set(re.findall(r'data-path="([^"]+)"', txt))
-    referenced.update(re.findall(r'data-pdf="([^"]*)"', txt))
-    files = {}
-    for p in sorted(doc_dir.iterdir()):
-        if p.name in ('index.html', 'INDEX.md', '_autogen_index.md'):
-            continue
-        if p.is_file():
-            files["./" + p.name] = p
-    if md_dir.exists():
-        for p in sorted(md_dir.iterdir()):
-            if p.is_file():
-                files["./md_outputs/" + p.name] = p
+    # scan the raw file and decode only the captured values
+    raw = index_path.read_bytes()
+    refs = set(_DATA_PATH_BYTES_RE.findall(raw))
+    refs.update(_DATA_PDF_BYTES_RE.findall(raw))
+    referenced = {r.decode('utf-8', errors='replace') for r in refs}
     unref = []
-    for rel, p in files.items():
-        if p.name.startswith('.') or p.name.startswith('~$'):
-            continue
-        if rel not in referenced:
-            unref.append((rel, str(p)))
+    # one pass per directory: cheap name checks first, then scandir's cached
+    # file type (no stat() or Path per entry)
+    scans = [(doc_dir, "./", SKIP_NAMES)]
+    if md_dir.exists():
+        scans.append((md_dir, "./md_outputs/", frozenset()))
+    for folder, prefix, skip in scans:
+        with os.scandir(folder) as it:
+            for e in sorted(it, key=lambda e: e.name):
+                name = e.name
+                if name in skip or name.startswith(SKIP_PREFIXES) or not e.is_file():
+                    continue
+                rel = prefix + name
+                if rel not in referenced:
+                    unref.append((rel, e.path))
     if not unref:
         print("All files are referenced in index.html")
         return 0
@@ -100,17 +159,11 @@ def connect_impl(doc_dir: Path, md_dir: Path, index_path: Path, dry_run: bool):
     # reuse the previous logic but simplified
     index_text = index_path.read_text(encoding='utf-8', errors='replace')
     # find categories
-    section_pat = re.compile(r'(<section\s+class="category"[^>]*?>\s*<h2>(?P<cat>.*?)</h2>.*?<ul\s+class="files"[^>]*?>)', re.S | re.I)
-    ul_close_re = re.compile(r'</ul\s*>', re.I)
-    li_re = re.compile(r'(<li\s+class="file"[\s\S]*?</li>)', re.I)
-    tags_re = re.compile(r'<div\s+class="tags[^>]*>(.*?)</div>', re.S | re.I)
-    title_re = re.compile(r'<div\s+class="title">.*?<a[^>]*>(.*?)</a>', re.S | re.I)
-
     categories = []
-    for m in section_pat.finditer(index_text):
+    for m in _SECTION_PAT.finditer(index_text):
         cat = html.unescape(m.group('cat').strip())
         ul_open_end = m.end(1)
-        ul_close_m = ul_close_re.search(index_text[ul_open_end:])
+        ul_close_m = _UL_CLOSE_RE.search(index_text[ul_open_end:])
         if not ul_close_m:
             continue
         ul_close_idx = ul_open_end + ul_close_m.start()
@@ -120,83 +173,83 @@ def connect_impl(doc_dir: Path, md_dir: Path, index_path: Path, dry_run: bool):
         print("No categories found; aborting connect.")
         return 1
 
-    md_files = sorted([p for p in md_dir.iterdir() if p.is_file() and p.suffix.lower()=='.md']) if md_dir.exists() else []
+    md_files = []
+    if md_dir.is_dir():
+        # scandir's DirEntry caches the file type, so no stat() per entry
+        with os.scandir(md_dir) as it:
+            md_files = sorted((Path(e.path) for e in it
+                               if e.name.lower().endswith('.md') and not e.name.startswith(('~$', '.'))
+                               and e.is_file()),
+                              key=lambda p: p.name)
     if not md_files:
         print("No md files found; nothing to connect.")
         return 0
 
-    modified = index_text
     planned = []
+    # (position in index_text, li_html); spliced in by one join after the
+    # loop, so category offsets never shift
+    insertions = []
+    # md paths already in the index or planned this run; one scan instead of
+    # a full-text substring search per md file
+    referenced_md = set(_MD_REF_RE.findall(index_text))
+    # one directory read instead of an exists() stat per md file
+    with os.scandir(doc_dir) as it:
+        pdf_names = {e.name for e in it if e.name.endswith('.pdf')}
+    # PDF stem -> first referenced value, one scan of the index; a data-path
+    # reference wins over a data-pdf one for the same stem
+    pdf_by_stem = {}
+    path_pdf_by_stem = {}
+    for m in _PDF_REF_RE.finditer(index_text):
+        target = path_pdf_by_stem if m.group(1).lower() == 'path' else pdf_by_stem
+        target.setdefault(_stem(m.group(2)), m.group(2))
+    pdf_by_stem.update(path_pdf_by_stem)
+    # data-pdf / data-path value -> first (category, li) carrying it
+    pdf_index = {}
+    for cat in categories:
+        for m in _LI_RE.finditer(index_text, cat['ul_open'], cat['ul_close']):
+            li = m.group(1)
+            for val in _LI_REF_RE.findall(li):
+                pdf_index.setdefault(val, (cat, li))
+    # bound once; the li template below escapes four values per insert
+    esc = html.escape
     for mdf in md_files:
-        if mdf.name.startswith('~$') or mdf.name.startswith('.'):
-            continue
         md_rel = f'./md_outputs/{mdf.name}'
-        if md_rel in index_text:
+        if md_rel in referenced_md:
             continue
         stem = mdf.stem
-        pdf_candidate = doc_dir / (stem + '.pdf')
-        pdf_rel = None
-        if pdf_candidate.exists():
-            pdf_rel = f'./{pdf_candidate.name}'
+        if stem + '.pdf' in pdf_names:
+            pdf_rel = f'./{stem}.pdf'
         else:
             # search index for pdf with same stem
-            for m in re.finditer(r'data-pdf="([^"]*\.pdf)"', index_text, re.I):
-                val = m.group(1)
-                if Path(val).stem == stem:
-                    pdf_rel = val
-                    break
-            for m in re.finditer(r'data-path="([^"]*\.pdf)"', index_text, re.I):
-                val = m.group(1)
-                if Path(val).stem == stem:
-                    pdf_rel = val
-                    break
+            pdf_rel = pdf_by_stem.get(stem)
         if not pdf_rel:
             continue
         # find li that references pdf_rel
-        found_cat = None
-        found_li = None
-        for cat in categories:
-            span = modified[cat['ul_open']:cat['ul_close']]
-            for li in li_re.findall(span):
-                if (f'data-pdf="{pdf_rel}"' in li) or (f'data-path="{pdf_rel}"' in li):
-                    found_cat = cat
-                    found_li = li
-                    break
-            if found_li:
-                break
-        if not found_cat:
+        hit = pdf_index.get(pdf_rel)
+        if not hit:
             continue
+        found_cat, found_li = hit
         # build li
         existing_tags = ""
         existing_title = mdf.stem
         if found_li:
-            mt = title_re.search(found_li)
+            mt = _TITLE_RE.search(found_li)
             if mt:
-                existing_title = re.sub(r'\s+', ' ', mt.group(1).strip()) or existing_title
-            mt2 = tags_re.search(found_li)
+                existing_title = _WS_RE.sub(' ', mt.group(1).strip()) or existing_title
+            mt2 = _TAGS_RE.search(found_li)
             if mt2:
                 existing_tags = ' '.join(mt2.group(1).strip().split())
         li_html = f"""
-            <li class="file" data-path="{html.escape(md_rel)}" data-pdf="{html.escape(pdf_rel)}">
+            <li class="file" data-path="{esc(md_rel)}" data-pdf="{esc(pdf_rel)}">
               <div class="meta">
-                <div class="title"><a href="#" class="file-link">{html.escape(existing_title)}</a></div>
+                <div class="title"><a href="#" class="file-link">{esc(existing_title)}</a></div>
                 <div class="desc"></div>
-                <div class="tags small-muted">{html.escape(existing_tags)}</div>
+                <div class="tags small-muted">{esc(existing_tags)}</div>
               </div>
             </li>
 """
-        # ensure not already present in found_cat span
-        cat_span = modified[found_cat['ul_open']:found_cat['ul_close']]
-        if md_rel in cat_span:
-            continue
-        insert_pos = found_cat['ul_close']
-        modified = modified[:insert_pos] + li_html + modified[insert_pos:]
-        # update category indices
-        delta = len(li_html)
-        for c in categories:
-            if c['ul_close'] >= insert_pos:
-                c['ul_close'] += delta
-                c['ul_open'] += delta
+        referenced_md.add(md_rel)
+        insertions.append((found_cat['ul_close'], li_html))
         planned.append((md_rel, pdf_rel, found_cat['name']))
 
     if not planned:
@@ -211,57 +264,60 @@ def connect_impl(doc_dir: Path, md_dir: Path, index_path: Path, dry_run: bool):
         print("Dry-run: nothing written.")
         return 0
 
-    bak = backup(index_path)
-    index_path.write_text(modified, encoding='utf-8')
+    # stable sort keeps same-category inserts in md order
+    parts = []
+    cursor = 0
+    for pos, li_html in sorted(insertions, key=lambda i: i[0]):
+        parts.append(index_text[cursor:pos])
+        parts.append(li_html)
+        cursor = pos
+    parts.append(index_text[cursor:])
+    modified = ''.join(parts)
+
+    bak = write_with_backup(index_path, modified)
     print(f"Wrote updated index (backup at {bak})")
     return 0
 
 # merge implementation: merge duplicate categories by normalized title, append li blocks
 def merge_impl(index_path: Path, dry_run: bool):
     txt = index_path.read_text(encoding='utf-8', errors='replace')
-    section_re = re.compile(r'(<section\s+class="category"[^>]*>.*?</section>)', re.S | re.I)
-    h2_re = re.compile(r'<h2>(.*?)</h2>', re.S | re.I)
-    ul_re = re.compile(r'(<ul\s+class="files"[^>]*>)(.*?)(</ul>)', re.S | re.I)
-    li_re = re.compile(r'(<li\s+class="file"[\s\S]*?</li>)', re.I)
-    data_path_re = re.compile(r'data-path="([^"]+)"', re.I)
-
-    sections = []
-    for m in section_re.finditer(txt):
+    # normalized title -> sections, in document order, filled in the parse pass
+    groups = defaultdict(list)
+    for m in _SECTION_BLOCK_RE.finditer(txt):
         block = m.group(1)
         start = m.start(1)
         end = m.end(1)
-        title_m = h2_re.search(block)
+        # search txt within the section's bounds rather than slices of it
+        title_m = _H2_RE.search(txt, start, end)
         title = title_m.group(1).strip() if title_m else ""
-        ul_m = ul_re.search(block)
-        inner = ul_m.group(2) if ul_m else ""
-        lis = li_re.findall(inner) if ul_m else []
-        sections.append({'title': title, 'full': block, 'start': start, 'end': end, 'lis': lis})
-
-    groups = {}
-    for s in sections:
-        key = ' '.join(s['title'].strip().lower().split())
-        groups.setdefault(key, []).append(s)
+        ul_m = _UL_RE.search(txt, start, end)
+        lis = [li.group(1) for li in _LI_RE.finditer(txt, ul_m.start(2), ul_m.end(2))] if ul_m else []
+        # offset of the </ul> inside block, where merged lis get appended
+        ul_inner_end = ul_m.end(2) - start if ul_m else None
+        key = ' '.join(title.lower().split())
+        groups[key].append({'title': title, 'full': block, 'start': start, 'end': end, 'lis': lis,
+                            'ul_inner_end': ul_inner_end})
 
     dup_keys = [k for k, v in groups.items() if len(v) > 1]
     if not dup_keys:
         print("No duplicate categories found.")
         return 0
 
-    new_txt = txt
     edits = []
+    data_path_search = _DATA_PATH_RE.search
     for key in dup_keys:
         group = groups[key]
         primary = group[0]
         others = group[1:]
         existing_paths = set()
         for li in primary['lis']:
-            m = data_path_re.search(li)
+            m = data_path_search(li)
             if m:
                 existing_paths.add(m.group(1))
         to_append = []
         for sec in others:
             for li in sec['lis']:
-                m = data_path_re.search(li)
+                m = data_path_search(li)
                 path = m.group(1) if m else None
                 if path and path in existing_paths:
                     continue
@@ -269,34 +325,32 @@ def merge_impl(index_path: Path, dry_run: bool):
                 if path:
                     existing_paths.add(path)
         if to_append:
-            new_primary = re.sub(ul_re, lambda m: m.group(1) + m.group(2) + ''.join(to_append) + m.group(3), primary['full'], count=1)
-            edits.append(('replace', primary['start'], primary['end'], primary['full'], new_primary))
+            new_primary = primary['full']
+            cut = primary['ul_inner_end']
+            if cut is not None:
+                new_primary = new_primary[:cut] + ''.join(to_append) + new_primary[cut:]
+            edits.append(('replace', primary['start'], primary['end'], new_primary))
         for sec in others:
-            edits.append(('remove', sec['start'], sec['end'], sec['full'], None))
-
-    # apply edits from end->start
-    edits_sorted = sorted(edits, key=lambda e: e[1], reverse=True)
-    for typ, sidx, eidx, old, new in edits_sorted:
-        snippet = new_txt[sidx:eidx]
-        if snippet != old:
-            found_at = new_txt.find(old)
-            if found_at == -1:
-                print(f"Warning: expected snippet not found for edit at {sidx}:{eidx}; skipping.")
-                continue
-            sidx = found_at
-            eidx = found_at + len(old)
+            edits.append(('remove', sec['start'], sec['end'], None))
+
+    # apply edits in one forward pass; every span refers to the original
+    # txt and sections never overlap, so nothing shifts
+    parts = []
+    cursor = 0
+    for typ, sidx, eidx, new in sorted(edits, key=lambda e: e[1]):
+        parts.append(txt[cursor:sidx])
         if typ == 'replace':
-            new_txt = new_txt[:sidx] + new + new_txt[eidx:]
-        else:
-            new_txt = new_txt[:sidx] + new_txt[eidx:]
+            parts.append(new)
+        cursor = eidx
+    parts.append(txt[cursor:])
+    new_txt = ''.join(parts)
 
     print(f"Merged keys: {', '.join(dup_keys)}")
     if dry_run:
         print("Dry-run: no file written.")
         return 0
 
-    bak = backup(index_path)
-    index_path.write_text(new_txt, encoding='utf-8')
+    bak = write_with_backup(index_path, new_txt)
     print(f"Wrote merged index to {index_path} (backup at {bak})")
     return 0
 
@@ -342,10 +396,8 @@ def convert_impl(doc_dir: Path, md_dir: Path, overwrite: bool):
         if target.exists() and not overwrite:
             print("Skipping existing:", target)
             continue
-        doc = fitz.open(str(pdf))
-        pages = []
-        for page in doc:
-            pages.append(page.get_text("text"))
+        with fitz.open(str(pdf)) as doc:
+            pages = [page.get_text("text") for page in doc]
         content = "\n\n---\n\n".join(pages).strip()
         header = f"# {pdf.stem}\n\nSource PDF: [{pdf.name}]({pdf.name})\n\n---\n\n"
         target.write_text(header + content + "\n", encoding='utf-8')
@@ -9,8 +9,9 @@ Usage:
   python3 tools/merge_duplicate_categories.py --index Doc/index.html --dry-run
 
 What it does:
- - Finds all <section class="category">...</section> blocks
- - Normalizes the <h2> category name (strip, lower)
+ - Finds all <section class="category">...</section> blocks (single HTMLParser
+   pass; falls back to regex extraction if parsing fails)
+ - Normalizes the <h2> category name (collapse whitespace, strip, casefold)
  - For any normalized name appearing >1, merges all <li class="file"> entries into the first block
  - Removes the other duplicate blocks
  - De-duplicates entries by the data-path attribute
@@ -18,20 +19,98 @@ What it does:
 """
 from __future__ import annotations
 import argparse
+import os
 import re
 import sys
 import shutil
 from pathlib import Path
 from datetime import datetime
 import html
+from collections import defaultdict
+from html.parser import HTMLParser
 
-SECTION_RE = re.compile(r'(<section\s+class="category"[^>]*>.*?</section>)', re.S | re.I)
+# Bodies use the unrolled-loop form [^<]*(?:<(?!/tag>)[^<]*)* rather than a lazy
+# .*? so each attempt is a single forward scan with nothing to backtrack into
+# (unclosed/malformed blocks fail in linear time instead of re-trying every length).
+SECTION_RE = re.compile(r'(<section\s+class="category"[^>]*>[^<]*(?:<(?!/section>)[^<]*)*</section>)', re.I)
 H2_RE = re.compile(r'<h2>(.*?)</h2>', re.S | re.I)
-UL_RE = re.compile(r'(<ul\s+class="files"[^>]*>)(.*?)(</ul>)', re.S | re.I)
-LI_RE = re.compile(r'(<li\s+class="file"[\s\S]*?</li>)', re.I)
+UL_RE = re.compile(r'(<ul\s+class="files"[^>]*>)([^<]*(?:<(?!/ul>)[^<]*)*)(</ul>)', re.I)
+LI_RE = re.compile(r'(<li\s+class="file"[^<]*(?:<(?!/li>)[^<]*)*</li>)', re.I)
 DATA_PATH_RE = re.compile(r'data-path="([^"]+)"', re.I)
+NEWLINE_RE = re.compile(r'\n')
+WS_RE = re.compile(r'\s+')
 
-def extract_sections(text: str):
+class _SectionParser(HTMLParser):
+    """
+    One linear tokenizer pass over index.html that records the spans of
+    <section class="category">, its <h2>, <ul class="files"> and each
+    <li class="file">. Offsets index into the original text so callers can
+    slice raw HTML exactly as the regex extractor did.
+    """
+    def __init__(self, text: str):
+        super().__init__(convert_charrefs=False)
+        self.text = text
+        # getpos() reports (line, col); map lines back to absolute offsets
+        self.line_starts = [0] + [m.end() for m in NEWLINE_RE.finditer(text)]
+        self.sections = []
+        self.cur = None
+        self.h2_start = None
+        self.in_ul = False
+        self.li_start = None
+
+    def _offset(self) -> int:
+        line, col = self.getpos()
+        return self.line_starts[line - 1] + col
+
+    def _end_of_tag(self, off: int) -> int:
+        return self.text.index('>', off) + 1
+
+    def handle_starttag(self, tag, attrs):
+        cls = dict(attrs).get('class') or ''
+        off = self._offset()
+        tag_end = off + len(self.get_starttag_text())
+        if tag == 'section' and cls == 'category' and self.cur is None:
+            self.cur = {'start': off, 'title': None, 'ul_open': "", 'ul_close': "",
+                        'ul_close_rel': None, 'li_list': []}
+        elif self.cur is None:
+            return
+        elif tag == 'h2' and self.cur['title'] is None and self.h2_start is None:
+            self.h2_start = tag_end
+        elif tag == 'ul' and cls == 'files' and not self.cur['ul_open'] and not self.in_ul:
+            self.cur['ul_open'] = self.text[off:tag_end]
+            self.in_ul = True
+        elif tag == 'li' and cls == 'file' and self.in_ul and self.li_start is None:
+            self.li_start = off
+
+    def handle_endtag(self, tag):
+        if self.cur is None:
+            return
+        off = self._offset()
+        if tag == 'h2' and self.h2_start is not None:
+            self.cur['title'] = self.text[self.h2_start:off].strip()
+            self.h2_start = None
+        elif tag == 'li' and self.li_start is not None:
+            self.cur['li_list'].append(self.text[self.li_start:self._end_of_tag(off)])
+            self.li_start = None
+        elif tag == 'ul' and self.in_ul:
+            end = self._end_of_tag(off)
+            self.cur['ul_close'] = self.text[off:end]
+            self.cur['ul_close_rel'] = off - self.cur['start']
+            self.in_ul = False
+        elif tag == 'section':
+            end = self._end_of_tag(off)
+            sec = self.cur
+            sec['end'] = end
+            sec['full_html'] = self.text[sec['start']:end]
+            sec['title'] = sec['title'] or ""
+            sec['key'] = normalize_name(sec['title'])
+            self.sections.append(sec)
+            self.cur = None
+            self.h2_start = None
+            self.in_ul = False
+            self.li_start = None
+
+def _extract_sections_regex(text: str):
     sections = []
     for m in SECTION_RE.finditer(text):
         full = m.group(1)
@@ -45,35 +124,49 @@ def extract_sections(text: str):
         ul_open = ulm.group(1) if ulm else ""
         ul_inner = ulm.group(2) if ulm else ""
         ul_close = ulm.group(3) if ulm else ""
+        # offset of </ul> inside full, so merges can splice without re-matching
+        ul_close_rel = ulm.start(3) if ulm else None
         lis = LI_RE.findall(ul_inner) if ulm else []
         sections.append({
             'title': title,
+            'key': normalize_name(title),
             'full_html': full,
             'start': start,
             'end': end,
             'ul_open': ul_open,
             'ul_close': ul_close,
+            'ul_close_rel': ul_close_rel,
             'li_list': lis,
         })
     return sections
 
+def extract_sections(text: str):
+    # Single HTMLParser pass; fall back to the nested-regex path if the
+    # parser chokes on malformed markup.
+    try:
+        parser = _SectionParser(text)
+        parser.feed(text)
+        parser.close()
+        return parser.sections
+    except Exception as e:
+        print(f"Warning: HTML parse failed ({e}); falling back to regex extraction.")
+        return _extract_sections_regex(text)
+
 def normalize_name(name: str) -> str:
-    return ' '.join(name.strip().lower().split())
+    # collapse whitespace in one regex pass; casefold also folds e.g. 'ß' -> 'ss'
+    return WS_RE.sub(' ', name).strip().casefold()
 
 def merge_sections(text: str):
     sections = extract_sections(text)
-    groups: dict[str, list] = {}
+    groups: defaultdict[str, list] = defaultdict(list)
     for s in sections:
-        key = normalize_name(s['title'])
-        groups.setdefault(key, []).append(s)
+        groups[s['key']].append(s)
 
     # find duplicates
     dup_keys = [k for k,v in groups.items() if len(v) > 1]
     if not dup_keys:
         return False, "No duplicate categories found", text
 
-    new_text = text
-    # We'll apply replacements from end->start so indices don't shift unexpectedly
     # Build a list of (remove_start, remove_end) for sections to remove, and replacements for the first section
     edits = []
     for key in dup_keys:
@@ -106,35 +199,44 @@ def merge_sections(text: str):
 
         # create new primary HTML: insert to_append before the closing </ul> of primary
         primary_block = primary['full_html']
-        # find the </ul> for the files list inside the primary block
-        new_primary = re.sub(UL_RE, lambda m: m.group(1) + m.group(2) + ''.join(to_append) + m.group(3), primary_block, count=1)
+        # splice at the </ul> offset recorded during extraction
+        close_rel = primary['ul_close_rel']
+        if close_rel is None:
+            new_primary = primary_block
+        else:
+            new_primary = primary_block[:close_rel] + ''.join(to_append) + primary_block[close_rel:]
         edits.append(('replace', primary['start'], primary['end'], primary['full_html'], new_primary))
         # remove the other sections
         for sec in others:
             edits.append(('remove', sec['start'], sec['end'], sec['full_html'], None))
 
-    # Apply edits sorted by start descending so indices remain valid
-    edits_sorted = sorted(edits, key=lambda e: e[1], reverse=True)
-    for typ, sidx, eidx, old, new in edits_sorted:
-        # sanity check old snippet exists at that span
-        snippet = new_text[sidx:eidx]
-        if snippet != old:
-            # try to locate the old snippet elsewhere (robustify)
-            found_at = new_text.find(old)
-            if found_at == -1:
-                # fallback: try to locate by title
-                # skip this edit if we cannot find exact old snippet
-                print(f"Warning: could not find exact section snippet to edit for start={sidx} end={eidx}. Skipping this edit.")
-                continue
-            else:
-                sidx = found_at
-                eidx = found_at + len(old)
+    # Apply edits in one ascending pass: copy unchanged text between edits,
+    # emit replacements, skip removed sections, then join once.
+    parts = []
+    cur = 0
+    for typ, sidx, eidx, old, new in sorted(edits, key=lambda e: e[1]):
+        # spans come from the single extraction pass over this same text
+        assert text[sidx:eidx] == old
+        parts.append(text[cur:sidx])
         if typ == 'replace':
-            new_text = new_text[:sidx] + new + new_text[eidx:]
-        elif typ == 'remove':
-            new_text = new_text[:sidx] + new_text[eidx:]
+            parts.append(new)
+        cur = eidx
+    parts.append(text[cur:])
+    new_text = "".join(parts)
     return True, f"Merged keys: {', '.join(dup_keys)}", new_text
 
+def atomic_replace_with_backup(path: Path, data: bytes, bak: Path):
+    """
+    Write data to a temp file beside path, move the current file to bak and
+    the temp file into place. Renames are metadata-only, so the index is
+    written once (no copy2) and never left half-written.
+    """
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    shutil.copymode(path, tmp)
+    os.rename(path, bak)
+    os.replace(tmp, path)
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument('--index', default='Doc/index.html', help='Path to index.html')
@@ -159,8 +261,7 @@ def main():
 
     # backup
     bak = index_path.parent / f"{index_path.name}.bak.{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-    shutil.copy2(index_path, bak)
-    index_path.write_text(new_txt, encoding='utf-8')
+    atomic_replace_with_backup(index_path, new_txt.encode('utf-8'), bak)
     print(f"Wrote merged index to {index_path} (backup at {bak})")
 
 if __name__ == '__main__':
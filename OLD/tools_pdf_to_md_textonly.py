@@ -13,6 +13,7 @@ Usage:
   python tools/pdf_to_md_textonly.py input.pdf
   python tools/pdf_to_md_textonly.py /path/to/pdf_dir --out-dir ./md_outputs --images
   python tools/pdf_to_md_textonly.py input.pdf --overwrite
+  python tools/pdf_to_md_textonly.py /path/to/pdf_dir --jobs 4
 
 Dependencies:
   pip install pymupdf html2text
@@ -25,6 +26,15 @@ import sys
 from pathlib import Path
 from typing import List, Tuple, Dict
 
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+try:
+    import html2text
+except ImportError:
+    html2text = None
+
 LOG = logging.getLogger("pdf_to_md_textonly")
 
 
@@ -32,65 +42,46 @@ def ensure_dir(p: Path):
     p.mkdir(parents=True, exist_ok=True)
 
 
-def extract_text_pages(pdf_path: Path) -> List[str]:
-    """Extract selectable text per page using PyMuPDF (get_text('text'))."""
-    try:
-        import fitz  # PyMuPDF
-    except Exception as e:
-        LOG.error("PyMuPDF (fitz) is required for text extraction: %s", e)
-        raise
+def make_html_converter():
+    """
+    Return an html2text converter configured for page HTML, or None if html2text is missing.
+    One converter is reused for every page of a document.
+    """
+    if html2text is None:
+        LOG.debug("html2text missing (HTML->MD fallback disabled)")
+        return None
 
-    doc = fitz.open(str(pdf_path))
-    pages_text: List[str] = []
-    for p in doc:
-        txt = p.get_text("text")
-        pages_text.append(txt or "")
-    doc.close()
-    return pages_text
+    converter = html2text.HTML2Text()
+    converter.body_width = 0
+    converter.ignore_images = True
+    return converter
 
 
-def html_page_to_markdown(pdf_path: Path, page_number: int) -> str:
+def html_page_to_markdown(page, converter) -> str:
     """
-    Use PyMuPDF get_text('html') for the page and convert HTML -> Markdown via html2text.
-    Return empty string on failure.
+    Use PyMuPDF get_text('html') for the page and convert HTML -> Markdown via converter.
+    Return empty string on failure or when converter is None.
     """
-    try:
-        import fitz
-        import html2text
-    except Exception as e:
-        LOG.debug("html2text or fitz missing (HTML->MD fallback disabled): %s", e)
+    if converter is None:
         return ""
 
     try:
-        doc = fitz.open(str(pdf_path))
-        page = doc[page_number]
         html = page.get_text("html")
-        doc.close()
         if not html:
             return ""
-        converter = html2text.HTML2Text()
-        converter.body_width = 0
-        converter.ignore_images = True
         md = converter.handle(html)
         return md.strip()
     except Exception as e:
-        LOG.debug("HTML->Markdown conversion failed for %s page %d: %s", pdf_path, page_number + 1, e)
+        LOG.debug("HTML->Markdown conversion failed for %s page %d: %s", page.parent.name, page.number + 1, e)
         return ""
 
 
-def extract_images(pdf_path: Path, out_image_dir: Path, prefix: str) -> Dict[int, List[Path]]:
+def extract_images(doc, out_image_dir: Path, prefix: str) -> Dict[int, List[Path]]:
     """
-    Extract embedded images from PDF and save into out_image_dir.
+    Extract embedded images from an open PDF and save into out_image_dir.
     Returns mapping page_index -> list of image paths.
     """
-    try:
-        import fitz
-    except Exception as e:
-        LOG.error("PyMuPDF (fitz) is required for image extraction: %s", e)
-        raise
-
     ensure_dir(out_image_dir)
-    doc = fitz.open(str(pdf_path))
     images_by_page: Dict[int, List[Path]] = {}
     for page_index, page in enumerate(doc):
         image_list = page.get_images(full=True)
@@ -114,7 +105,6 @@ def extract_images(pdf_path: Path, out_image_dir: Path, prefix: str) -> Dict[int
                 LOG.warning("Failed to save image on page %d idx %d: %s", page_index + 1, img_idx, e)
         if saved:
             images_by_page[page_index] = saved
-    doc.close()
     return images_by_page
 
 
@@ -124,44 +114,93 @@ def build_markdown_for_pdf(
     out_image_dir: Path,
     extract_images_flag: bool = False,
 ):
-    """Build markdown for a PDF (text-only approach, no OCR)."""
+    """Build markdown for a PDF (text-only approach, no OCR).
+
+    The PDF is opened once and the document is shared by the text, HTML and
+    image passes, instead of being reopened for every page.
+    Pages are written out as they are converted, to a temp file that replaces
+    out_md_path only once the whole document is done, so a failed run never
+    leaves a partial .md that later runs would skip as existing.
+    """
     LOG.info("Processing PDF: %s", pdf_path)
     ensure_dir(out_md_path.parent)
 
-    pages_text = extract_text_pages(pdf_path)
+    tmp_path = out_md_path.with_name(out_md_path.name + ".tmp")
+    try:
+        with fitz.open(str(pdf_path)) as doc, tmp_path.open("w", encoding="utf-8") as f:
+            _write_markdown(doc, f, pdf_path, out_md_path, out_image_dir, extract_images_flag)
+        os.replace(tmp_path, out_md_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    LOG.info("Wrote Markdown: %s", out_md_path)
+
+
+def _write_markdown(doc, f, pdf_path: Path, out_md_path: Path, out_image_dir: Path,
+                    extract_images_flag: bool):
     images_by_page = {}
     if extract_images_flag:
-        images_by_page = extract_images(pdf_path, out_image_dir, prefix=pdf_path.stem)
+        images_by_page = extract_images(doc, out_image_dir, prefix=pdf_path.stem)
+
+    converter = make_html_converter()
+
+    def block(text: str):
+        # blocks are separated by a blank line, as "\n\n".join() would
+        f.write("\n\n")
+        f.write(text)
 
-    md_lines: List[str] = []
-    md_lines.append(f"# {pdf_path.stem}\n")
-    md_lines.append(f"_Source: {pdf_path.name}_\n")
+    f.write(f"# {pdf_path.stem}\n")
+    block(f"_Source: {pdf_path.name}_\n")
 
-    for i, page_text in enumerate(pages_text):
-        md_lines.append("\n---\n")
-        md_lines.append(f"\n## Page {i+1}\n")
+    for i, page in enumerate(doc):
+        page_text = page.get_text("text") or ""
+        block("\n---\n")
+        block(f"\n## Page {i+1}\n")
         # Prefer HTML->Markdown if it gives something structured
         if page_text.strip():
-            md_html_md = html_page_to_markdown(pdf_path, i)
+            md_html_md = html_page_to_markdown(page, converter)
             if md_html_md:
-                md_lines.append(md_html_md)
+                block(md_html_md)
             else:
-                md_lines.append(page_text.rstrip())
+                block(page_text.rstrip())
         else:
-            md_lines.append("\n*(No selectable text on this page)*\n")
+            block("\n*(No selectable text on this page)*\n")
 
         # Insert any embedded images if requested
         imgs = images_by_page.get(i, [])
         for img_path in imgs:
             rel = os.path.relpath(img_path, out_md_path.parent)
-            md_lines.append(f"\n![image]({rel})\n")
+            block(f"\n![image]({rel})\n")
 
-    out_md_path.write_text("\n\n".join(md_lines), encoding="utf-8")
-    LOG.info("Wrote Markdown: %s", out_md_path)
+
+def _init_worker(level: int):
+    logging.basicConfig(format="%(levelname)s: %(message)s", level=level)
+
+
+def convert_pdfs(jobs: List[Tuple[Path, Path, Path]], args):
+    """
+    Run build_markdown_for_pdf for each (pdf, out_md, out_img_dir).
+    With --jobs > 1 the PDFs are spread over worker processes; parsing is
+    CPU-bound, so threads would serialize on the GIL.
+    """
+    workers = max(1, min(args.jobs, len(jobs)))
+    if workers == 1:
+        for pdf, out_md, out_img_dir in jobs:
+            build_markdown_for_pdf(pdf, out_md, out_img_dir, extract_images_flag=args.images)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(LOG.getEffectiveLevel(),)) as ex:
+        futs = [ex.submit(build_markdown_for_pdf, pdf, out_md, out_img_dir, args.images)
+                for pdf, out_md, out_img_dir in jobs]
+        for f in as_completed(futs):
+            f.result()
 
 
 def process_path(input_path: Path, out_dir: Path, args):
     if input_path.is_dir():
+        jobs = []
         for p in sorted(input_path.iterdir()):
             if p.is_file() and p.suffix.lower() == ".pdf":
                 out_md = out_dir / (p.stem + ".md")
@@ -169,7 +208,8 @@ def process_path(input_path: Path, out_dir: Path, args):
                 if out_md.exists() and not args.overwrite:
                     LOG.info("Skipping existing file (use --overwrite to force): %s", out_md)
                     continue
-                build_markdown_for_pdf(p, out_md, out_img_dir, extract_images_flag=args.images)
+                jobs.append((p, out_md, out_img_dir))
+        convert_pdfs(jobs, args)
     elif input_path.is_file():
         if input_path.suffix.lower() != ".pdf":
             LOG.error("Input file is not a PDF: %s", input_path)
@@ -192,6 +232,8 @@ def parse_args():
     p.add_argument("--images", action="store_true", help="Extract embedded images (default: false)")
     p.add_argument("--overwrite", action="store_true", help="Overwrite existing .md outputs")
     p.add_argument("--quiet", action="store_true", help="Less logging output")
+    p.add_argument("--jobs", "-j", type=int, default=1,
+                   help="Convert up to N PDFs in parallel worker processes (default: 1)")
     return p.parse_args()
 
 
@@ -200,6 +242,9 @@ def main():
     level = logging.INFO if args.quiet else logging.DEBUG
     logging.basicConfig(format="%(levelname)s: %(message)s", level=level)
     LOG.info("Starting text-only pdf -> md converter (NO OCR)")
+    if fitz is None:
+        LOG.error("PyMuPDF (fitz) is required for text extraction: pip install pymupdf")
+        sys.exit(2)
 
     input_path = Path(args.input)
     out_dir = Path(args.out_dir)
@@ -11,6 +11,8 @@ What it does:
  - Parses categories ( <section class="category"> <h2>NAME</h2> <ul class="files"> ... )
  - Lists entries per category
  - Let you select one or more entries and move them to another category (or create a new category)
+ - Moves are staged in memory (answer 'c' at the save prompt to stage more); the
+   index is rewritten once when you save
  - Updates the <div class="tags small-muted">... to include the new category
  - Backs up index file to Doc/index.html.bak.TIMESTAMP before writing changes
 
@@ -20,27 +22,46 @@ Notes:
 """
 from __future__ import annotations
 import argparse
+import os
 import re
 import sys
 import shutil
 from pathlib import Path
 from datetime import datetime
 import html
+from functools import lru_cache
+
+CATEGORY_RE = re.compile(
+    r'(<section\s+class="category"[^>]*?>\s*<h2>(?P<cat>.*?)</h2>.*?<ul\s+class="files"[^>]*?>)',
+    re.S | re.I
+)
+CLOSE_UL_RE = re.compile(r'</ul\s*>', re.I)
+# Unrolled loop instead of lazy [\s\S]*?: linear scan, no backtracking on unclosed <li>
+LI_RE = re.compile(r'(<li\s+class="file"[^<]*(?:<(?!/li>)[^<]*)*</li>)', re.I)
+# per-LI field patterns (compiled once; parse_li_data runs for every entry)
+DATA_PATH_RE = re.compile(r'data-path="([^"]+)"')
+DATA_PDF_RE = re.compile(r'data-pdf="([^"]*)"')
+TITLE_RE = re.compile(r'<div\s+class="title">.*?<a[^>]*>(.*?)</a>', re.S)
+TAGS_RE = re.compile(r'<div\s+class="tags[^>]*>(.*?)</div>', re.S)
+TAGS_SPLIT_RE = re.compile(r'(<div\s+class="tags[^>]*>)(.*?)(</div>)', re.S)
+LEFT_TYPE_RE = re.compile(r'\s*([A-Za-z0-9_()+\- ]+)\s*')
+WS_RE = re.compile(r'\s+')
+LISTS_CLOSE_RE = re.compile(r'</div>\s*</aside>', re.I)
+
+# moves usually share one target category, so the same strings get escaped repeatedly
+_esc = lru_cache(maxsize=1024)(html.escape)
 
 def find_categories(index_text: str):
-    pattern = re.compile(
-        r'(<section\s+class="category"[^>]*?>\s*<h2>(?P<cat>.*?)</h2>.*?<ul\s+class="files"[^>]*?>)',
-        re.S | re.I
-    )
     categories = []
-    for m in pattern.finditer(index_text):
+    for m in CATEGORY_RE.finditer(index_text):
         cat = html.unescape(m.group('cat').strip())
         section_start = m.start(1)
         ul_open_start = m.end(1)
-        ul_close_match = re.search(r'</ul\s*>', index_text[ul_open_start:], re.I)
+        # search from pos instead of slicing the rest of the document
+        ul_close_match = CLOSE_UL_RE.search(index_text, ul_open_start)
         if not ul_close_match:
             continue
-        ul_close_index = ul_open_start + ul_close_match.start()
+        ul_close_index = ul_close_match.start()
         categories.append({
             'name': cat,
             'ul_open_index': ul_open_start,
@@ -49,31 +70,31 @@ def find_categories(index_text: str):
         })
     return categories
 
-def extract_li_blocks(ul_html: str):
-    # find all <li class="file"...>...</li>
-    li_pattern = re.compile(r'(<li\s+class="file"[\s\S]*?</li>)', re.I)
-    return li_pattern.findall(ul_html)
-
 def parse_li_data(li_html: str):
     # get data-path
-    m_path = re.search(r'data-path="([^"]+)"', li_html)
-    m_pdf = re.search(r'data-pdf="([^"]*)"', li_html)
+    m_path = DATA_PATH_RE.search(li_html)
+    m_pdf = DATA_PDF_RE.search(li_html)
     path = m_path.group(1) if m_path else ""
     pdf = m_pdf.group(1) if m_pdf else ""
     # title inside <div class="title">...<a ...>Title</a>...
-    m_title = re.search(r'<div\s+class="title">.*?<a[^>]*>(.*?)</a>', li_html, re.S)
-    title = re.sub(r'\s+', ' ', m_title.group(1).strip()) if m_title else ""
+    m_title = TITLE_RE.search(li_html)
+    title = WS_RE.sub(' ', m_title.group(1).strip()) if m_title else ""
     # tags div
-    m_tags = re.search(r'<div\s+class="tags[^>]*>(.*?)</div>', li_html, re.S)
-    tags = re.sub(r'\s+', ' ', m_tags.group(1).strip()) if m_tags else ""
+    m_tags = TAGS_RE.search(li_html)
+    tags = WS_RE.sub(' ', m_tags.group(1).strip()) if m_tags else ""
     return {'html': li_html, 'data_path': path, 'data_pdf': pdf, 'title': title, 'tags': tags}
 
 def list_entries_by_cat(index_text: str, categories: list):
     entries = []
-    for idx, c in enumerate(categories):
-        ul_html = index_text[c['ul_open_index']:c['ul_close_index']]
-        li_blocks = extract_li_blocks(ul_html)
-        parsed = [parse_li_data(li) for li in li_blocks]
+    for c in categories:
+        # scan the ul range in place (pos/endpos) rather than slicing it out
+        li_iter = LI_RE.finditer(index_text, c['ul_open_index'], c['ul_close_index'])
+        parsed = []
+        for m in li_iter:
+            e = parse_li_data(m.group(1))
+            # span in the original text; entries without one were added this session
+            e['span'] = m.span(1)
+            parsed.append(e)
         entries.append(parsed)
     return entries
 
@@ -105,10 +126,10 @@ def update_tags_in_li(li_html: str, new_cat: str):
     # replace existing tags block content (preserve type if present)
     # look for pattern like: <div class="tags small-muted">TXT · Guides</div>
     # We'll keep the left part up to the first '·' if present (type). If none, leave type blank.
-    m = re.search(r'(<div\s+class="tags[^>]*>)(.*?)(</div>)', li_html, re.S)
+    m = TAGS_SPLIT_RE.search(li_html)
     if not m:
         # append a tags div
-        tag_html = f'<div class="tags small-muted">{html.escape(new_cat)}</div>'
+        tag_html = f'<div class="tags small-muted">{_esc(new_cat)}</div>'
         # insert before closing </div> of meta (safe hack: insert before last </div> in li)
         li_html = li_html.replace('</div>\n            </li>', f'{tag_html}\n            </li>')
         return li_html
@@ -119,17 +140,76 @@ def update_tags_in_li(li_html: str, new_cat: str):
         new_content = f"{left} · {new_cat}"
     else:
         # try to preserve a known type (e.g., 'PDF', 'MD', 'TXT') at start (word characters)
-        left_match = re.match(r'\s*([A-Za-z0-9_()+\- ]+)\s*', content)
+        left_match = LEFT_TYPE_RE.match(content)
         if left_match and len(content.strip())>0:
             left = left_match.group(1).strip()
             new_content = f"{left} · {new_cat}"
         else:
             new_content = new_cat
-    new_block = pre + html.escape(new_content) + post
+    new_block = pre + _esc(new_content) + post
     # replace the first occurrence
     li_html = li_html[:m.start(1)] + new_block + li_html[m.end(3):]
     return li_html
 
+NEW_SECTION_TEMPLATE = '''
+        <section class="category" data-category="{name}">
+          <h2>{name}</h2>
+          <ul class="files">
+          {entries}</ul>
+        </section>
+'''
+
+def render_index(text: str, categories: list, entries_by_cat: list, dirty: set):
+    """
+    Serialize the in-memory model back into text in one pass.
+    For each changed category: drop original <li> spans no longer listed,
+    then append entries added this session before </ul>. New categories are
+    inserted before the closing of the #lists area.
+    """
+    edits = []
+    new_sections = []
+    for idx in sorted(dirty):
+        c = categories[idx]
+        entries = entries_by_cat[idx]
+        added = "".join(e['html'] for e in entries if 'span' not in e)
+        if c.get('new'):
+            new_sections.append(NEW_SECTION_TEMPLATE.format(name=_esc(c['name']), entries=added))
+            continue
+        kept = {e['span'] for e in entries if 'span' in e}
+        parts = []
+        cur = c['ul_open_index']
+        for m in LI_RE.finditer(text, c['ul_open_index'], c['ul_close_index']):
+            if m.span(1) not in kept:
+                parts.append(text[cur:m.start(1)])
+                cur = m.end(1)
+        parts.append(text[cur:c['ul_close_index']])
+        parts.append(added)
+        edits.append((c['ul_open_index'], c['ul_close_index'], "".join(parts)))
+    if new_sections:
+        insert_pos = LISTS_CLOSE_RE.search(text).start()
+        edits.append((insert_pos, insert_pos, "".join(new_sections)))
+
+    out = []
+    cur = 0
+    for start, end, new in sorted(edits, key=lambda e: e[0]):
+        out.append(text[cur:start])
+        out.append(new)
+        cur = end
+    out.append(text[cur:])
+    return "".join(out)
+
+def atomic_replace_with_backup(path: Path, data: bytes, bak: Path):
+    """
+    Write data to a temp file beside path, move the current file to bak and
+    the temp file into place. Renames are metadata-only, so the index is
+    written once (no copy2) and never left half-written.
+    """
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    shutil.copymode(path, tmp)
+    os.rename(path, bak)
+    os.replace(tmp, path)
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument('--index', default='Doc/index.html')
@@ -145,7 +225,10 @@ def main():
         print("No categories detected in index.html. Aborting.")
         sys.exit(1)
 
+    # parse once; moves below only touch this in-memory model and the
+    # text is regenerated a single time on save
     entries_by_cat = list_entries_by_cat(text, categories)
+    dirty = set()
 
     # show categories and counts
     print("\nCategories found:")
@@ -157,7 +240,10 @@ def main():
     while True:
         src_choice = input("\nEnter the number of the category you want to edit (or 'q' to quit): ").strip()
         if src_choice.lower() == 'q':
-            print("No changes made. Exiting.")
+            if dirty:
+                print("Staged changes discarded. Exiting without writing.")
+            else:
+                print("No changes made. Exiting.")
             return
         try:
             src_idx = int(src_choice)-1
@@ -203,28 +289,14 @@ def main():
             if not new_name:
                 print("Empty name; aborted.")
                 continue
-            # create new category HTML and append before </div></aside>
-            new_section = f'''
-        <section class="category" data-category="{html.escape(new_name)}">
-          <h2>{html.escape(new_name)}</h2>
-          <ul class="files">
-          </ul>
-        </section>
-'''
-            # insert before the closing of #lists area
-            lists_close = re.search(r'</div>\s*</aside>', text, re.I)
-            if lists_close:
-                insert_pos = lists_close.start()
-                text = text[:insert_pos] + new_section + text[insert_pos:]
-                # re-parse categories and entries
-                categories = find_categories(text)
-                entries_by_cat = list_entries_by_cat(text, categories)
-                # find index of the newly created category
-                tgt_idx = next(i for i,c in enumerate(categories) if c['name'].strip().lower()==new_name.strip().lower())
-                print(f"Created new category '{new_name}'.")
-            else:
+            # new category is written before </div></aside> (closing of #lists area) on save
+            if not LISTS_CLOSE_RE.search(text):
                 print("Could not find insertion point for new category. Aborting.")
                 continue
+            categories.append({'name': new_name, 'new': True})
+            entries_by_cat.append([])
+            tgt_idx = len(categories) - 1
+            print(f"Created new category '{new_name}'.")
         else:
             try:
                 tgt_idx = int(tgt_choice)-1
@@ -238,58 +310,32 @@ def main():
         tgt_cat = categories[tgt_idx]['name']
         print(f"Moving {len(indices)} entr{'y' if len(indices)==1 else 'ies'} from '{src_cat}' -> '{tgt_cat}'")
 
-        # perform moves: remove from src ul and insert into target ul; update tags inside li
-        # Rebuild text by working with indices (note: categories list contains indices into current 'text')
-        # Extract li blocks for current categories (fresh)
-        categories = find_categories(text)
-        entries_by_cat = list_entries_by_cat(text, categories)
-
-        # get current li blocks' positions for source category
-        s = categories[src_idx]
-        ul_content = text[s['ul_open_index']:s['ul_close_index']]
-        li_blocks = extract_li_blocks(ul_content)
-        # build map index->li_html (as present in text)
-        selected_li_htmls = []
-        # remove from ul content by replacing exact li block occurrences (first occurrence)
-        for local_idx in sorted(indices, reverse=True):
-            try:
-                li_html = li_blocks[local_idx]
-            except IndexError:
+        # perform moves in the model: drop from source list, append to target
+        # with tags updated (entries keep their original relative order)
+        selected = set()
+        for local_idx in indices:
+            if 0 <= local_idx < len(src_entries):
+                selected.add(local_idx)
+            else:
                 print(f"Index {local_idx+1} out of range; skipping")
-                continue
-            selected_li_htmls.append(li_html)
-            # remove one occurrence of this li_html
-            ul_content = ul_content.replace(li_html, '', 1)
-        # write back updated source ul content
-        text = text[:s['ul_open_index']] + ul_content + text[s['ul_close_index']:]
-
-        # update target positions after modification
-        categories = find_categories(text)
-        tgt = categories[tgt_idx]
-        insert_pos = tgt['ul_close_index']
-        # reverse selected_li_htmls to preserve original order when inserting at insert_pos
-        for li_html in reversed(selected_li_htmls):
-            # update tags inside li to reflect new category
-            new_li = update_tags_in_li(li_html, tgt_cat)
-            text = text[:insert_pos] + new_li + text[insert_pos:]
-            # adjust insert_pos earlier for next insert (we're inserting before the same close tag)
-            # no need to adjust since we keep inserting before the closing tag
-
-        # After operation, re-parse categories and entries so loop can continue
-        categories = find_categories(text)
-        entries_by_cat = list_entries_by_cat(text, categories)
+        moved = [e for j, e in enumerate(src_entries) if j in selected]
+        entries_by_cat[src_idx] = [e for j, e in enumerate(src_entries) if j not in selected]
+        for e in moved:
+            entries_by_cat[tgt_idx].append(parse_li_data(update_tags_in_li(e['html'], tgt_cat)))
+        dirty.update((src_idx, tgt_idx))
 
         # confirm and optionally save
         print("\nOperation staged. Preview of target category entries (recent additions at end):")
-        tgt_idx = next(i for i,c in enumerate(categories) if c['name']==tgt_cat)
         for j,e in enumerate(entries_by_cat[tgt_idx], start=1):
             print(f" {j}. {e['title']}  [{e['data_path']}]  tags: {e['tags']}")
 
-        save = input("\nSave changes to index.html? [y/N]: ").strip().lower()
+        save = input("\nSave changes to index.html? [y/N, c = continue editing]: ").strip().lower()
+        if save == 'c':
+            continue
         if save == 'y':
+            text = render_index(text, categories, entries_by_cat, dirty)
             bak = index_path.parent / f"{index_path.name}.bak.{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            shutil.copy2(index_path, bak)
-            index_path.write_text(text, encoding='utf-8')
+            atomic_replace_with_backup(index_path, text.encode('utf-8'), bak)
             print(f"Wrote updated index to {index_path} (backup at {bak})")
         else:
             print("Changes not saved. Exiting without writing.")
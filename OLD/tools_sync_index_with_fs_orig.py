@@ -13,7 +13,7 @@ This script:
  - parses Doc/index.html to find categories and data-path references
  - interactively asks you where to place unreferenced files (category, title, one-line desc)
  - inserts <li class="file"> entries into the chosen category's <ul class="files">
- - makes a timestamped backup of Doc/index.html before writing
+ - keeps the previous Doc/index.html as a timestamped backup when writing
 """
 from __future__ import annotations
 import argparse
@@ -22,6 +22,8 @@ import re
 import sys
 import shutil
 import html
+from html.parser import HTMLParser
+from collections import defaultdict
 from pathlib import Path
 from datetime import datetime
 
@@ -35,25 +37,55 @@ LI_TEMPLATE = """
             </li>
 """
 
+_RE_DATA_PATH = re.compile(r'data-path="([^"]+)"')
+_RE_DATA_PDF = re.compile(r'data-pdf="([^"]*)"')
+_RE_CATEGORY = re.compile(
+    r'(<section\s+class="category"[^>]*?>\s*<h2>(?P<cat>.*?)</h2>.*?<ul\s+class="files"[^>]*?>)',
+    re.S | re.I
+)
+_RE_UL_CLOSE = re.compile(r'</ul\s*>', re.I)
+_RE_ASIDE_CLOSE = re.compile(r'</div>\s*</aside>', re.I)
+
+class _RefParser(HTMLParser):
+    """Collect data-path / data-pdf attribute values from real start tags.
+    Values come back entity-decoded, so they compare equal to on-disk
+    names (e.g. 'A &amp; B.pdf' -> 'A & B.pdf'), and text inside <script>
+    is never mistaken for markup."""
+    def __init__(self):
+        super().__init__()
+        self.paths = set()
+        self.pdfs = set()
+
+    def handle_starttag(self, tag, attrs):
+        for k, v in attrs:
+            if k == 'data-path' and v:
+                self.paths.add(v)
+            elif k == 'data-pdf' and v is not None:
+                self.pdfs.add(v)
+
 def find_existing_references(index_html_text: str):
-    paths = set(re.findall(r'data-path="([^"]+)"', index_html_text))
-    pdfs = set(re.findall(r'data-pdf="([^"]*)"', index_html_text))
+    try:
+        parser = _RefParser()
+        parser.feed(index_html_text)
+        parser.close()
+        return parser.paths, parser.pdfs
+    except Exception as e:
+        print(f"Warning: HTML parse failed ({e}); falling back to regex scan.")
+    paths = set(_RE_DATA_PATH.findall(index_html_text))
+    pdfs = set(_RE_DATA_PDF.findall(index_html_text))
     return paths, pdfs
 
 def find_categories(index_html_text: str):
-    pattern = re.compile(
-        r'(<section\s+class="category"[^>]*?>\s*<h2>(?P<cat>.*?)</h2>.*?<ul\s+class="files"[^>]*?>)',
-        re.S | re.I
-    )
     categories = []
-    for m in pattern.finditer(index_html_text):
+    for m in _RE_CATEGORY.finditer(index_html_text):
         cat = html.unescape(m.group('cat').strip())
         section_start = m.start(1)
         ul_open_start = m.end(1)
-        ul_close_match = re.search(r'</ul\s*>', index_html_text[ul_open_start:], re.I)
+        # search from pos instead of slicing off the rest of the document
+        ul_close_match = _RE_UL_CLOSE.search(index_html_text, ul_open_start)
         if not ul_close_match:
             continue
-        ul_close_index = ul_open_start + ul_close_match.start()
+        ul_close_index = ul_close_match.start()
         categories.append({
             'name': cat,
             'ul_open_index': ul_open_start,
@@ -62,25 +94,55 @@ def find_categories(index_html_text: str):
         })
     return categories
 
+def _scan_files(d: Path) -> list[os.DirEntry]:
+    """Regular files in d, sorted by name. DirEntry caches the type from the
+    directory read, so this costs no per-file stat() calls."""
+    with os.scandir(d) as it:
+        return sorted((e for e in it if e.is_file()), key=lambda e: e.name)
+
 def pretty_path(p: Path, doc_dir: Path):
     rel = p.relative_to(doc_dir)
     return "./" + str(rel).replace(os.path.sep, "/")
 
-def file_first_lines(path: Path, n=6):
+_BINARY_SUFFIXES = {'.pdf', '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.heic', '.docx'}
+
+def file_first_lines(path: Path, n=6, max_bytes=4096):
+    if path.suffix.lower() in _BINARY_SUFFIXES:
+        return "[binary file: preview skipped]"
     try:
-        with path.open('r', encoding='utf-8', errors='replace') as f:
-            lines = []
-            for _ in range(n):
-                line = f.readline()
-                if not line:
-                    break
-                lines.append(line.rstrip('\n'))
-            return "\n".join(lines)
+        # one bounded read instead of n text-mode readline() calls
+        with path.open('rb') as f:
+            data = f.read(max_bytes)
+        return "\n".join(data.decode('utf-8', errors='replace').splitlines()[:n])
     except Exception as e:
         return f"[cannot preview file: {e}]"
 
-def html_escape(s: str):
-    return html.escape(s)
+def atomic_replace_with_backup(path: Path, data: bytes, bak: Path):
+    """
+    Write data to a temp file beside path, move the current file to bak and
+    the temp file into place. Renames are metadata-only, so the backup costs
+    no data copy and the index is never left half-written.
+    """
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    shutil.copymode(path, tmp)
+    os.rename(path, bak)
+    os.replace(tmp, path)
+
+def new_section_html(cat_name: str, li_htmls: list[str]) -> str:
+    entries = "".join(li_htmls)
+    return f"""
+        <section class="category" data-category="{html_escape(cat_name)}">
+          <h2>{html_escape(cat_name)}</h2>
+          <ul class="files">
+{entries}
+          </ul>
+        </section>
+"""
+
+# html.escape is a chain of C-level str.replace calls, faster on these short
+# fields than a str.translate table; bind it directly rather than wrapping it
+html_escape = html.escape
 
 def main():
     ap = argparse.ArgumentParser(description="Sync Doc/index.html with filesystem: add unreferenced files interactively.")
@@ -104,22 +166,28 @@ def main():
     index_text = index_path.read_text(encoding='utf-8', errors='replace')
 
     existing_paths, existing_pdfs = find_existing_references(index_text)
+    # a file counts as referenced if any indexed path shares its stem
+    # (e.g. Doc/foo.pdf is covered by ./md_outputs/foo.md)
+    existing_stems = {Path(ep).stem for ep in existing_paths}
     categories = find_categories(index_text)
     cat_names = [c['name'] for c in categories]
 
+    doc_entries = _scan_files(doc_dir)
     disk_files = []
-    for p in sorted(doc_dir.iterdir()):
-        if p.name in (index_path.name, 'INDEX.md', '_autogen_index.md', 'index.html.bak'):
+    for e in doc_entries:
+        if e.name in (index_path.name, 'INDEX.md', '_autogen_index.md', 'index.html.bak'):
             continue
-        if p.is_dir():
-            continue
-        disk_files.append(p)
+        disk_files.append(Path(e.path))
 
     md_files = []
-    if md_dir.exists() and md_dir.is_dir():
-        for p in sorted(md_dir.iterdir()):
-            if p.is_file():
-                md_files.append(p)
+    if md_dir.is_dir():
+        md_files = [Path(e.path) for e in _scan_files(md_dir)]
+
+    # stem -> PDF name in Doc/, for linking md_outputs/*.md back to their PDF
+    pdf_by_stem = {}
+    for e in doc_entries:
+        if e.name.lower().endswith('.pdf'):
+            pdf_by_stem.setdefault(Path(e.name).stem, e.name)
 
     doc_rel_paths = {pretty_path(p, doc_dir): p for p in disk_files}
     md_rel_paths = {('./' + 'md_outputs/' + p.name): p for p in md_files}
@@ -132,8 +200,7 @@ def main():
     for rel_path, p in combined_paths.items():
         if rel_path in existing_paths:
             continue
-        stem = p.stem
-        if any(stem in ep for ep in existing_paths):
+        if p.stem in existing_stems:
             continue
         unreferenced.append((rel_path, p))
 
@@ -142,11 +209,11 @@ def main():
         return
 
     print(f"Found {len(unreferenced)} unreferenced file(s).")
-    bak = index_path.parent / f"{index_path.name}.bak.{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    shutil.copy2(index_path, bak)
-    print(f"Backed up {index_path} -> {bak}")
-
-    modified_text = index_text
+    # Inserts are only planned here and spliced into index_text in one pass
+    # after the loop, so no offsets need adjusting as entries are added.
+    inserts_at = defaultdict(list)  # ul_close_index -> [li_html, ...]
+    new_sections = {}               # lowercased name -> (name, [li_html, ...])
+    lists_close = _RE_ASIDE_CLOSE.search(index_text)
     inserts_made = []
 
     for rel_path, p in unreferenced:
@@ -209,11 +276,9 @@ def main():
 
         data_pdf = ''
         if rel_path.startswith('./md_outputs/'):
-            stem = p.stem
-            for cand in doc_dir.iterdir():
-                if cand.is_file() and cand.suffix.lower() == '.pdf' and cand.stem == stem:
-                    data_pdf = "./" + cand.name
-                    break
+            pdf_name = pdf_by_stem.get(p.stem)
+            if pdf_name:
+                data_pdf = "./" + pdf_name
         else:
             if p.suffix.lower() == '.pdf':
                 data_pdf = rel_path
@@ -228,35 +293,34 @@ def main():
 
         cat_obj = next((c for c in categories if c['name'].strip().lower() == chosen_cat.strip().lower()), None)
         if cat_obj:
-            insert_pos = cat_obj['ul_close_index']
-            modified_text = modified_text[:insert_pos] + li_html + modified_text[insert_pos:]
-            delta = len(li_html)
-            for c in categories:
-                if c['ul_close_index'] >= insert_pos:
-                    c['ul_close_index'] += delta
-                    c['ul_open_index'] += delta
-                    c['section_start'] += delta
+            inserts_at[cat_obj['ul_close_index']].append(li_html)
             print(f"Inserted into existing category '{chosen_cat}'.")
+        elif chosen_cat.strip().lower() in new_sections:
+            new_sections[chosen_cat.strip().lower()][1].append(li_html)
+            print(f"Inserted into new category '{chosen_cat}'.")
         else:
-            lists_close = re.search(r'</div>\s*</aside>', modified_text, re.I)
-            new_section_html = f"""
-        <section class="category" data-category="{html_escape(chosen_cat)}">
-          <h2>{html_escape(chosen_cat)}</h2>
-          <ul class="files">
-{li_html}
-          </ul>
-        </section>
-"""
+            new_sections[chosen_cat.strip().lower()] = (chosen_cat, [li_html])
             if lists_close:
-                insert_pos = lists_close.start()
-                modified_text = modified_text[:insert_pos] + new_section_html + modified_text[insert_pos:]
                 print(f"Created new category '{chosen_cat}' and inserted entry.")
             else:
-                modified_text = modified_text + new_section_html
                 print(f"Appended new category '{chosen_cat}' at end of file and inserted entry.")
 
         inserts_made.append({'path': rel_path, 'title': title, 'category': chosen_cat})
 
+    if new_sections:
+        sections_pos = lists_close.start() if lists_close else len(index_text)
+        inserts_at[sections_pos].append(
+            "".join(new_section_html(name, lis) for name, lis in new_sections.values()))
+
+    parts = []
+    prev = 0
+    for pos in sorted(inserts_at):
+        parts.append(index_text[prev:pos])
+        parts.extend(inserts_at[pos])
+        prev = pos
+    parts.append(index_text[prev:])
+    modified_text = "".join(parts)
+
     print("\nSummary of inserts:")
     for it in inserts_made:
         print(f" - {it['path']} -> {it['category']} (title: {it['title']})")
@@ -266,10 +330,11 @@ def main():
         confirm = input(f"\nWrite changes to {index_path}? [y/N]: ").strip().lower()
 
     if confirm == 'y' or args.yes_to_all:
-        index_path.write_text(modified_text, encoding='utf-8')
+        bak = index_path.parent / f"{index_path.name}.bak.{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        atomic_replace_with_backup(index_path, modified_text.encode('utf-8'), bak)
         print(f"Wrote updated index to {index_path} (backup at {bak})")
     else:
-        print("Aborted; no changes written. Backup left at:", bak)
+        print("Aborted; no changes written.")
 
 if __name__ == '__main__':
     main()
@@ -11,24 +11,37 @@ import os
 import re
 import sys
 
+# bytes patterns: scan the raw file and decode only the captured values
+_RE_DATA_PATH = re.compile(rb'data-path="([^"]+)"')
+_RE_DATA_PDF = re.compile(rb'data-pdf="([^"]*)"')
+
 def parse_index(index_path: Path):
-    txt = index_path.read_text(encoding='utf-8', errors='replace')
-    paths = set(re.findall(r'data-path="([^"]+)"', txt))
+    raw = index_path.read_bytes()
+    refs = set(_RE_DATA_PATH.findall(raw))
     # also gather data-pdf references
-    pdfs = set(re.findall(r'data-pdf="([^"]*)"', txt))
-    return paths.union(pdfs)
+    refs.update(_RE_DATA_PDF.findall(raw))
+    return {r.decode('utf-8', errors='replace') for r in refs}
+
+def _scan_files(d: Path) -> list[os.DirEntry]:
+    """Regular files in d, sorted by name. DirEntry caches the type from the
+    directory read, so this costs no per-file stat() calls."""
+    with os.scandir(d) as it:
+        return sorted((e for e in it if e.is_file()), key=lambda e: e.name)
+
+def _listable(name: str) -> bool:
+    # skip dotfiles and temporary editor files
+    return not (name.startswith('.') or name.startswith('~$'))
 
 def gather_files(doc_dir: Path, md_dir: Path):
     files = {}
-    for p in sorted(doc_dir.iterdir()):
-        if p.name in ('index.html', 'INDEX.md', '_autogen_index.md'):
+    for e in _scan_files(doc_dir):
+        if e.name in ('index.html', 'INDEX.md', '_autogen_index.md') or not _listable(e.name):
             continue
-        if p.is_file():
-            files["./" + p.name] = p
-    if md_dir.exists():
-        for p in sorted(md_dir.iterdir()):
-            if p.is_file():
-                files["./md_outputs/" + p.name] = p
+        files["./" + e.name] = Path(e.path)
+    if md_dir.is_dir():
+        for e in _scan_files(md_dir):
+            if _listable(e.name):
+                files["./md_outputs/" + e.name] = Path(e.path)
     return files
 
 def main():
@@ -50,9 +63,6 @@ def main():
 
     unreferenced = []
     for rel, path in files.items():
-        # skip dotfiles and temporary editor files
-        if path.name.startswith('.') or path.name.startswith('~$'):
-            continue
         if rel not in referenced:
             unreferenced.append((rel, str(path)))
 
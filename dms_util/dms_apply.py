@@ -61,6 +61,9 @@ def apply_changes(state_path: Path, pending_path: Path, scripts_dir: Path) -> in
     # Group by category for reporting
     by_category = {}
     
+    # One timestamp for the whole batch (last_processed and last_apply)
+    applied_at = datetime.now().isoformat()
+    
     # Apply each approval
     for summary_info in approved:
         file_path = summary_info['file']['path']
@@ -76,7 +79,7 @@ def apply_changes(state_path: Path, pending_path: Path, scripts_dir: Path) -> in
             'summary': summary_info.get('summary', ''),
             'summary_approved': True,
             'title': summary_info.get('title', Path(file_path).stem),
-            'last_processed': datetime.now().isoformat()
+            'last_processed': applied_at
         }
         
         # Include file modification time if available
@@ -104,7 +107,7 @@ def apply_changes(state_path: Path, pending_path: Path, scripts_dir: Path) -> in
         print(f"  + {count} file(s) → {category}")
     
     # Update metadata
-    state['metadata']['last_apply'] = datetime.now().isoformat()
+    state['metadata']['last_apply'] = applied_at
     
     # Save updated state
     state_path.write_text(json.dumps(state, indent=2), encoding='utf-8')
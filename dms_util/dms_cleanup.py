@@ -8,6 +8,7 @@ this removes it from the state.
 Then regenerates index.html.
 """
 import argparse
+import os
 import sys
 import json
 import subprocess
@@ -33,11 +34,9 @@ def main():
     state = json.loads(state_path.read_text(encoding='utf-8'))
     
     # Find files that are in state but not on disk
-    missing_files = []
-    for file_path in list(state['documents'].keys()):
-        full_path = doc_dir / file_path.lstrip('./')
-        if not full_path.exists():
-            missing_files.append(file_path)
+    documents = state['documents']
+    missing_files = [file_path for file_path in documents
+                     if not (doc_dir / file_path.lstrip('./')).exists()]
     
     if not missing_files:
         print("✓ No deleted files to clean up.")
@@ -46,12 +45,14 @@ def main():
     print(f"==> Removing {len(missing_files)} deleted file(s) from state...\n")
     
     for file_path in missing_files:
-        category = state['documents'][file_path].get('category', 'Unknown')
+        category = documents.pop(file_path).get('category', 'Unknown')
         print(f"  - {Path(file_path).name} (was in {category})")
-        del state['documents'][file_path]
     
-    # Save updated state
-    state_path.write_text(json.dumps(state, indent=2), encoding='utf-8')
+    # Save updated state: write a temp file and rename it over the old one,
+    # so an interrupted run never leaves a truncated .dms_state.json
+    tmp_path = state_path.with_name(state_path.name + '.tmp')
+    tmp_path.write_text(json.dumps(state, indent=2), encoding='utf-8')
+    os.replace(tmp_path, state_path)
     print(f"\n✓ Updated {state_path}")
     
     # Regenerate index.html
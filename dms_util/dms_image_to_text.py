@@ -3,19 +3,29 @@
 dms_image_to_text.py - Convert images, PDFs, and DOCX files to text/markdown
 
 Reads .dms_scan.json to find convertible files.
-- Converts images (PNG, JPG, etc.) to text via OCR (tesseract)
+- Converts images (PNG, JPG, etc.) to text via OCR (tesseract, batched per job)
 - Converts PDFs to markdown via pandoc
 - Converts DOCX to markdown via pandoc
 Outputs text/markdown files to md_outputs/ for later summarization.
+Files are converted in parallel (--jobs, default: CPU count).
 
 Does NOT update any state files - just produces intermediate text files.
 """
 import argparse
+import hashlib
+import os
+import shutil
 import sys
 import json
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# tesseract is multi-threaded by itself; when several run side by side, one
+# thread each avoids oversubscribing the cores
+_TESSERACT_PARALLEL_ENV = {**os.environ, "OMP_THREAD_LIMIT": "1"}
+
 def load_scan_results(scan_path: Path) -> dict:
     """Load .dms_scan.json to see what changed"""
     if not scan_path.exists():
@@ -50,7 +60,40 @@ def find_convertible_files(files: list, doc_dir: Path) -> dict:
         'docx': docx_files
     }
 
-def convert_image_to_text(image_path: str, doc_dir: Path, md_dir: Path) -> bool:
+def output_is_fresh(src_path: Path, output_path: Path) -> bool:
+    """True if output_path exists and is at least as new as src_path"""
+    try:
+        return os.stat(output_path).st_mtime_ns >= os.stat(src_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+def image_digest(path: Path) -> str:
+    """BLAKE2b digest of the image bytes, the key for the OCR cache"""
+    h = hashlib.blake2b(digest_size=16)
+    with path.open('rb') as f:
+        while chunk := f.read(65536):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_ocr_cache(cache_path: Path, md_dir: Path) -> dict:
+    """Load .dms_ocr_cache.json (image digest -> .txt name in md_outputs/),
+    dropping entries whose text file is gone"""
+    try:
+        cache = json.loads(cache_path.read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return {}
+    return {digest: name for digest, name in cache.items() if (md_dir / name).exists()}
+
+def run_conversions(convert, paths: list, doc_dir: Path, md_dir: Path, jobs: int, **kwargs) -> int:
+    """Run convert over paths, up to jobs at a time; returns number converted"""
+    jobs = max(1, min(jobs, len(paths)))
+    if jobs == 1:
+        return sum(convert(p, doc_dir, md_dir, **kwargs) for p in paths)
+    # each conversion waits on an external tool, so threads are enough
+    with ThreadPoolExecutor(max_workers=jobs) as ex:
+        return sum(ex.map(lambda p: convert(p, doc_dir, md_dir, **kwargs), paths))
+
+def convert_image_to_text(image_path: str, doc_dir: Path, md_dir: Path, env=None) -> bool:
     """Convert image to text using tesseract"""
     
     full_path = doc_dir / image_path.lstrip('./')
@@ -63,17 +106,14 @@ def convert_image_to_text(image_path: str, doc_dir: Path, md_dir: Path) -> bool:
     output_filename = f"{Path(image_path).stem}.txt"
     output_path = md_dir / output_filename
     
-    if output_path.exists():
-        print(f"  ✓ Already converted: {output_filename}")
-        return True
-    
     try:
         # Use tesseract to extract text
         result = subprocess.run(
             ['tesseract', str(full_path), str(output_path.with_suffix(''))],
             capture_output=True,
             text=True,
-            timeout=60
+            timeout=60,
+            env=env
         )
         
         if result.returncode == 0 and output_path.exists():
@@ -96,6 +136,137 @@ def convert_image_to_text(image_path: str, doc_dir: Path, md_dir: Path) -> bool:
         return False
 
 
+def convert_images_batch(image_paths: list, doc_dir: Path, md_dir: Path, env=None) -> int:
+    """OCR several images with one tesseract process; returns number converted
+    
+    tesseract accepts a text file listing images and writes every page to
+    one output, separated by form feeds, so trained data is loaded once per
+    batch instead of once per image. If the batch fails or the page count
+    does not match, falls back to one tesseract run per image.
+    """
+    # missing images just get the usual per-file warning
+    missing = [p for p in image_paths if not (doc_dir / p.lstrip('./')).exists()]
+    if missing:
+        for p in missing:
+            convert_image_to_text(p, doc_dir, md_dir, env=env)
+        image_paths = [p for p in image_paths if p not in missing]
+    if len(image_paths) < 2:
+        return sum(convert_image_to_text(p, doc_dir, md_dir, env=env) for p in image_paths)
+    full_paths = [doc_dir / p.lstrip('./') for p in image_paths]
+    
+    list_file = None
+    try:
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+            f.write("".join(f"{fp.resolve()}\n" for fp in full_paths))
+            list_file = f.name
+        result = subprocess.run(
+            ['tesseract', list_file, 'stdout'],
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=60 * len(image_paths),
+            env=env
+        )
+        pages = result.stdout.split('\f')
+        # older tesseract ends every page with the separator, newer only
+        # puts it between pages
+        if len(pages) == len(image_paths) + 1 and not pages[-1]:
+            pages.pop()
+        if result.returncode != 0 or len(pages) != len(image_paths):
+            raise RuntimeError("batch output did not match the image list")
+    except FileNotFoundError:
+        print(f"  ✗ tesseract not found - install with: brew install tesseract")
+        return 0
+    except (subprocess.TimeoutExpired, RuntimeError):
+        print(f"  ⚠ Batch OCR failed, converting {len(image_paths)} images one by one")
+        return sum(convert_image_to_text(p, doc_dir, md_dir, env=env) for p in image_paths)
+    finally:
+        if list_file:
+            os.unlink(list_file)
+    
+    lines = []
+    for image_path, text in zip(image_paths, pages):
+        output_filename = f"{Path(image_path).stem}.txt"
+        (md_dir / output_filename).write_text(text, encoding='utf-8')
+        lines.append(f"  ✓ Converted: {output_filename}")
+    print("\n".join(lines))
+    return len(image_paths)
+
+
+def convert_images(images: list, doc_dir: Path, md_dir: Path, jobs: int) -> int:
+    """OCR images whose .txt is missing or stale; returns number converted
+    
+    Text is reused without running tesseract when the .txt is newer than
+    the image, or when an image with the same bytes was OCR'd before
+    (.dms_ocr_cache.json) or earlier in this run.
+    """
+    cache_path = md_dir.parent / ".dms_ocr_cache.json"
+    ocr_cache = load_ocr_cache(cache_path, md_dir)
+    
+    def forget(name):
+        # name is about to hold other text; entries pointing at it are stale
+        for d in [d for d, n in ocr_cache.items() if n == name]:
+            del ocr_cache[d]
+    
+    up_to_date = reused = 0
+    to_ocr = []
+    pending = {}      # digest -> image sent to OCR
+    duplicates = []   # (image, digest) with the same bytes as a pending image
+    for image_path in images:
+        full_path = doc_dir / image_path.lstrip('./')
+        output_filename = f"{Path(image_path).stem}.txt"
+        output_path = md_dir / output_filename
+        if output_is_fresh(full_path, output_path):
+            print(f"  ✓ Already converted: {output_filename}")
+            up_to_date += 1
+            continue
+        if not full_path.exists():
+            to_ocr.append(image_path)  # reported as not found
+            continue
+        digest = image_digest(full_path)
+        cached = ocr_cache.get(digest)
+        if cached:
+            if cached == output_filename:
+                os.utime(output_path)
+            else:
+                forget(output_filename)
+                shutil.copyfile(md_dir / cached, output_path)
+            print(f"  ✓ Reused OCR text: {output_filename}")
+            reused += 1
+        elif digest in pending:
+            duplicates.append((image_path, digest))
+        else:
+            pending[digest] = image_path
+            to_ocr.append(image_path)
+    
+    jobs = max(1, min(jobs, len(to_ocr)))
+    env = _TESSERACT_PARALLEL_ENV if jobs > 1 else None
+    batches = [to_ocr[i::jobs] for i in range(jobs)] if to_ocr else []
+    ocr_done = run_conversions(convert_images_batch, batches, doc_dir, md_dir, jobs, env=env)
+    
+    for digest, image_path in pending.items():
+        output_filename = f"{Path(image_path).stem}.txt"
+        if output_is_fresh(doc_dir / image_path.lstrip('./'), md_dir / output_filename):
+            forget(output_filename)
+            ocr_cache[digest] = output_filename
+    for image_path, digest in duplicates:
+        output_filename = f"{Path(image_path).stem}.txt"
+        source = ocr_cache.get(digest)
+        if not source:
+            print(f"  ✗ Failed to convert {image_path} (same image failed OCR)")
+            continue
+        if source != output_filename:
+            forget(output_filename)
+            shutil.copyfile(md_dir / source, md_dir / output_filename)
+        print(f"  ✓ Reused OCR text: {output_filename}")
+        reused += 1
+    
+    cache_path.write_text(json.dumps(ocr_cache, indent=2), encoding='utf-8')
+    print(f"  {up_to_date} up to date, {reused} reused, {len(to_ocr)} sent to OCR")
+    return up_to_date + reused + ocr_done
+
+
 def convert_pdf_to_markdown(pdf_path: str, doc_dir: Path, md_dir: Path) -> bool:
     """Convert PDF to text using pdftotext, then save as markdown"""
     
@@ -202,6 +373,8 @@ def convert_docx_to_markdown(docx_path: str, doc_dir: Path, md_dir: Path) -> boo
 def main():
     parser = argparse.ArgumentParser(description="Convert images to text")
     parser.add_argument("--doc", default="Doc", help="Doc directory")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Files to convert in parallel (default: CPU count)")
     args = parser.parse_args()
     
     doc_dir = Path(args.doc)
@@ -234,28 +407,22 @@ def main():
     
     converted = 0
     
-    # Convert images
+    # Convert images (one tesseract batch per job)
     if images:
         print(f"Images ({len(images)}):")
-        for image_path in images:
-            if convert_image_to_text(image_path, doc_dir, md_dir):
-                converted += 1
+        converted += convert_images(images, doc_dir, md_dir, args.jobs)
         print()
     
     # Convert PDFs
     if pdfs:
         print(f"PDFs ({len(pdfs)}):")
-        for pdf_path in pdfs:
-            if convert_pdf_to_markdown(pdf_path, doc_dir, md_dir):
-                converted += 1
+        converted += run_conversions(convert_pdf_to_markdown, pdfs, doc_dir, md_dir, args.jobs)
         print()
     
     # Convert DOCX files
     if docx_files:
         print(f"DOCX files ({len(docx_files)}):")
-        for docx_path in docx_files:
-            if convert_docx_to_markdown(docx_path, doc_dir, md_dir):
-                converted += 1
+        converted += run_conversions(convert_docx_to_markdown, docx_files, doc_dir, md_dir, args.jobs)
         print()
     
     print(f"✓ {converted}/{total_convertible} files converted\n")